@@ -0,0 +1,272 @@
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Reproducible benchmarks, no live archive needed: the pages in fixtures/ are served by
+# a local StubWaybackServer and everything else runs on seeded synthetic data.
+#
+#   python benchmark.py --sites 3 --keywords 9 --days 365 --output benchmark_results.json
+#
+# Every measurement becomes one record {benchmark, case, params, seconds (median),
+# runs, items, items_per_second, ...} in the JSON output, so runs on different commits
+# can be compared with a few lines of code.
+
+KEYWORDS = ["Senior", "Middle", "Junior", "Intern", "Internship", "Chief", "Lead", "Головний", "Старший",
+            "Молодший", "Analyst", "Developer", "Manager", "Cloud", "QA", "HR", "Recruiter", "Talent"]
+
+
+def keyword_list(count):
+    # The scripts' keywords first, then made-up ones
+    return (KEYWORDS + [f"Keyword{index}" for index in range(count)])[:count]
+
+
+def measure(fn, repeat):
+    # Runs fn once untimed (imports, caches), then `repeat` timed runs.
+    # Returns (seconds of each run, fn's last result)
+    result = fn()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return runs, result
+
+
+def record(benchmark, case, runs, items=None, **extra):
+    seconds = statistics.median(runs)
+    entry = {'benchmark': benchmark, 'case': case, 'seconds': seconds, 'runs': runs}
+    if items is not None:
+        entry['items'] = items
+        entry['items_per_second'] = items / seconds if seconds else None
+    entry.update(extra)
+    return entry
+
+
+def bench_fetch(fixtures, days, max_workers, repeat):
+    # Snapshot download throughput through the shared session and throttle, one
+    # stub capture per day for each fixture's site
+    from vacancies import wayback
+    from vacancies.stub_server import StubWaybackServer
+
+    results = []
+    settings, host = dict(wayback.THROTTLE_SETTINGS), wayback.WAYBACK_HOST
+    fetch_settings = dict(wayback.FETCH_SETTINGS)
+    wayback.THROTTLE_SETTINGS['rate'] = 1e6  # Local server, no need to pace requests
+    wayback.configure_fetch(max_workers, max_workers)
+    try:
+        for fixture in fixtures:
+            first_day = fixture['capture_date']
+            timestamps = [(first_day + timedelta(days=offset)).strftime("%Y%m%d") for offset in range(days)]
+            with StubWaybackServer() as stub:  # One server per fixture, both djinni layouts share a URL
+                wayback.WAYBACK_HOST = stub.url
+                for timestamp in timestamps:
+                    stub.add_capture(fixture['website_url'], f"{timestamp}120000", fixture['html'])
+
+                def fetch():
+                    return [snapshot for _, snapshot in wayback.fetch_snapshots(
+                        fixture['website_url'], timestamps, max_workers=max_workers)]
+
+                runs, snapshots = measure(fetch, repeat)
+            size_bytes = sum(snapshot.size_bytes for snapshot in snapshots if snapshot)
+            results.append(record('fetch', fixture['file'], runs, items=len(timestamps),
+                                  params={'days': days, 'max_workers': max_workers},
+                                  failed=sum(snapshot is None for snapshot in snapshots),
+                                  megabytes_per_second=size_bytes / 1024 ** 2 / statistics.median(runs)))
+    finally:
+        # Put the archive settings back for the benchmarks that follow
+        wayback.THROTTLE_SETTINGS.clear()
+        wayback.THROTTLE_SETTINGS.update(settings)
+        wayback.WAYBACK_HOST = host
+        wayback.configure_fetch(fetch_settings['pool_size'], fetch_settings['max_per_host'])
+    return results
+
+
+def bench_parse(fixtures, repeat, pages=50):
+    # Title extraction per site extractor: fast (lxml tree), stream (lxml pull parser) and
+    # legacy (html.parser)
+    from vacancies.extractors import STREAM_LIMITS, etree, extract_titles
+
+    modes = {'fast': {}, 'stream': {'stream_limits': STREAM_LIMITS}, 'legacy': {'legacy': True}}
+    results = []
+    for fixture in fixtures:
+        html = fixture['html'].encode('utf-8')
+        for mode, options in modes.items():
+            if etree is None and mode != 'legacy':
+                continue
+
+            def parse():
+                for _ in range(pages):
+                    titles = extract_titles(fixture['website_url'], html, fixture['capture_date'], **options)
+                return titles
+
+            runs, titles = measure(parse, repeat)
+            results.append(record('parse', f"{fixture['file']}/{mode}", runs, items=pages,
+                                  params={'pages': pages}, titles_per_page=len(titles),
+                                  page_bytes=len(html)))
+    return results
+
+
+def bench_match(fixtures, keyword_count, repeat, titles_count=50_000):
+    # Keyword counting over extracted titles: KeywordMatcher against the per-keyword
+    # substring loop it replaced
+    from vacancies.extractors import extract_titles
+    from vacancies.matcher import KeywordMatcher
+
+    pool = [title for fixture in fixtures
+            for title in extract_titles(fixture['website_url'], fixture['html'], fixture['capture_date'])]
+    titles = [pool[index % len(pool)] for index in range(titles_count)]
+    keywords = keyword_list(keyword_count)
+    matcher = KeywordMatcher(keywords)
+
+    def substring_loop():
+        counts = dict.fromkeys(keywords, 0)
+        for title in titles:
+            for keyword in keywords:
+                if keyword.lower() in title.lower():
+                    counts[keyword] += 1
+        return counts
+
+    cases = [
+        ('substring_loop', substring_loop),
+        ('matcher_hit_counts', lambda: matcher.hit_counts(titles)),
+        ('matcher_hit_sets', lambda: matcher.hit_sets(titles)),
+    ]
+    params = {'titles': titles_count, 'keywords': keyword_count}
+    results = []
+    expected = None
+    for case, fn in cases:
+        runs, counts = measure(fn, repeat)
+        if case != 'matcher_hit_sets':
+            expected = expected or counts
+            agrees = counts == expected
+        else:
+            agrees = None
+        results.append(record('match', case, runs, items=titles_count, params=params, agrees=agrees))
+    return results
+
+
+def synthetic_results(sites, keyword_count, days, seed=0):
+    # ResultsTable with `sites` × `keywords` × `days` rows of random counts
+    from vacancies.results_table import ResultsTable
+
+    rng = random.Random(seed)
+    keywords = keyword_list(keyword_count)
+    results = ResultsTable()
+    total_quantity_all = {}
+    for site in range(sites):
+        website_url = f"https://site{site}.example.com/jobs/"
+        for offset in range(days):
+            day = (datetime(2020, 1, 1) + timedelta(days=offset)).strftime("%Y%m%d")
+            counts = {keyword: rng.randrange(0, 40) for keyword in keywords}
+            total = sum(counts.values())
+            total_quantity_all[day] = total_quantity_all.get(day, 0) + total
+            for keyword, quantity in counts.items():
+                results.add(website_url, day, keyword, quantity, quantity / total * 100 if total else 0,
+                            total_positions=total + rng.randrange(0, 20), total_keyword_positions=total,
+                            total_quantity_all=total_quantity_all[day], capture_date=day)
+    return results
+
+
+def bench_render(sites, keyword_count, days, repeat, out_dir):
+    # Charts and export formats of both reports on a synthetic results table
+    from vacancies.exporters import EXPORT_EXTENSIONS
+    from vacancies.reports import REPORTS, export_results
+
+    results = []
+    params = {'sites': sites, 'keywords': keyword_count, 'days': days}
+    table = synthetic_results(sites, keyword_count, days)
+    rows = len(table)
+    runs, frame = measure(table.to_frame, repeat)
+    results.append(record('table', 'to_frame', runs, items=rows, params=params))
+
+    start_date, end_date = datetime(2020, 1, 1), datetime(2020, 1, 1) + timedelta(days=days - 1)
+    export_formats = ['xlsx', 'csv'] + (['parquet'] if importlib.util.find_spec('pyarrow') else []) + \
+                     (['xlsx-sites'] if importlib.util.find_spec('xlsxwriter') else [])
+    for name, report in REPORTS.items():
+        for case, options in [('chart', {}), ('chart_light', {'light': True, 'plotly_js': 'shared'}),
+                              ('chart_light_week', {'light': True, 'plotly_js': 'shared', 'bucket': 'week'})]:
+            output_file = os.path.join(out_dir, f"{name}_{case}.html")
+            runs, _ = measure(lambda: report.create_chart(frame, start_date, end_date, output_file, **options), repeat)
+            results.append(record('render', f"{name}/{case}", runs, items=rows, params=params,
+                                  output_bytes=os.path.getsize(output_file)))
+        for export_format in export_formats:
+            output_file = os.path.join(out_dir, f"{name}_export{EXPORT_EXTENSIONS[export_format]}")
+            runs, _ = measure(lambda: export_results(frame, name, output_file, export_format), repeat)
+            results.append(record('export', f"{name}/{export_format}", runs, items=rows, params=params,
+                                  output_bytes=os.path.getsize(output_file)))
+    return results
+
+
+def environment():
+    import pandas
+    import plotly
+    from vacancies.extractors import etree
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'versions': {'pandas': pandas.__version__, 'plotly': plotly.__version__,
+                     'lxml': '.'.join(map(str, etree.LXML_VERSION)) if etree is not None else None},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetching, parsing, matching, charts and exports")
+    parser.add_argument('--sites', type=int, default=3, help='Sites in the synthetic results (N)')
+    parser.add_argument('--keywords', type=int, default=9, help='Keywords per site (M)')
+    parser.add_argument('--days', type=int, default=365, help='Days per site (D)')
+    parser.add_argument('--fetch-days', type=int, default=60, help='Snapshots fetched per fixture')
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case, the median is reported')
+    parser.add_argument('--only', default='fetch,parse,match,render',
+                        help='Comma-separated benchmarks to run: fetch, parse, match, render')
+    parser.add_argument('--fixtures', default='fixtures')
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    from vacancies.extractors import load_fixtures
+    fixtures = load_fixtures(args.fixtures)
+    selected = set(args.only.split(','))
+    results = []
+    log = io.StringIO()  # The code under test prints per request, keep it out of the way
+    with tempfile.TemporaryDirectory() as out_dir, redirect_stdout(log):
+        if 'fetch' in selected:
+            results += bench_fetch(fixtures, args.fetch_days, args.max_workers, args.repeat)
+        if 'parse' in selected:
+            results += bench_parse(fixtures, args.repeat)
+        if 'match' in selected:
+            results += bench_match(fixtures, args.keywords, args.repeat)
+        if 'render' in selected:
+            results += bench_render(args.sites, args.keywords, args.days, args.repeat, out_dir)
+
+    report = {'environment': environment(), 'parameters': vars(args), 'results': results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for entry in results:
+        rate = f"{entry['items_per_second']:,.0f}/s" if entry.get('items_per_second') else ""
+        print(f"{entry['benchmark']:7} {entry['case']:32} {entry['seconds'] * 1000:10.1f} ms {rate:>14}")
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+import os
+import pytest
+from vacancies import metrics, wayback
+from vacancies.extractors import load_fixtures
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+
+@pytest.fixture(scope="session")
+def fixtures():
+    # Recorded snapshots from fixtures/, found relative to this file
+    return load_fixtures(FIXTURES_DIR)
+
+
+@pytest.fixture(scope="session")
+def fixtures_by_file(fixtures):
+    return {fixture['file']: fixture for fixture in fixtures}
+
+
+@pytest.fixture(autouse=True)
+def restore_globals(monkeypatch):
+    # prepare_fetch, configure_fetch, set_cache and set_quiet change module settings as a
+    # run would; each test gets them back as they were so no stub URL, cache, connection
+    # pool or retry pacing leaks into the next
+    monkeypatch.setattr(wayback, 'THROTTLE_SETTINGS', dict(wayback.THROTTLE_SETTINGS))
+    monkeypatch.setattr(wayback, 'FETCH_SETTINGS', dict(wayback.FETCH_SETTINGS))
+    for name in ('WAYBACK_HOST', 'BACKOFF_BASE', '_cache', '_session', '_throttles'):
+        monkeypatch.setattr(wayback, name, getattr(wayback, name))
+    monkeypatch.setattr(metrics, '_quiet', metrics._quiet)
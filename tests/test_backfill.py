@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+import os
+import pytest
+from vacancies.backfill import WorkQueue, merge_shards, plan_shards, queue_path, run_workers
+from vacancies.cli import analyze_sites, prepare_fetch
+from vacancies.config import load_config, output_file
+from vacancies.metrics import set_quiet
+from vacancies.stub_server import StubWaybackServer
+
+
+@pytest.mark.parametrize('granularity', ['day', 'week'])
+def test_backfill_matches_single_run(fixtures_by_file, tmp_path, granularity):
+    # Backfills two sites with 3 worker processes through a local stub that fails 10% of
+    # requests, with one shard left leased by a worker that "crashed", and compares the
+    # merged results with a single-process run over the same captures. 10-day shards
+    # starting on a Wednesday would split weeks if they were not aligned to them
+    days, workers = 42, 3
+    set_quiet(True)
+    with StubWaybackServer() as stub:
+        sites = {}
+        for name in ('djinni_old.html', 'workua.html'):
+            fixture = fixtures_by_file[name]
+            sites[fixture['website_url']] = ["Senior", "Middle", "Junior", "Developer"]
+            for offset in range(days):
+                stub.add_capture(fixture['website_url'],
+                                 f"{fixture['capture_date'] + timedelta(days=offset):%Y%m%d}120000", fixture['html'])
+
+        settings = {
+            'report': 'combined', 'sites': sites,
+            'start_date': "2023-03-01", 'end_date': f"{datetime(2023, 3, 1) + timedelta(days=days + 110):%Y-%m-%d}",
+            'capture_granularity': granularity, 'shard_days': 10, 'lease_seconds': 3.0, 'max_attempts': 5, 'parse_processes': 0,
+            'wayback_host': stub.url, 'cache_dir': str(tmp_path / "cache"),
+        }
+        config = load_config(base=dict(settings, output_prefix=str(tmp_path / "backfill")))
+        single = load_config(base=dict(settings, output_prefix=str(tmp_path / "single"),
+                                       cache_dir=str(tmp_path / "single_cache")))
+
+        planned = plan_shards(config)
+        queue = WorkQueue(queue_path(config))
+        crashed = queue.claim("crashed-worker", lease_seconds=1.0)  # Never renewed until the shard ran again
+        queue.close()
+        stub.set_faults(error_rate=0.1, seed=1)
+        assert run_workers(config, workers, quiet=True) == planned
+
+        # The crashed worker comes back: its shard was run again, so its attempt is refused
+        queue = WorkQueue(queue_path(config))
+        stale_output = os.path.join(output_file(config, "shards"), f"shard_{crashed.id}_{crashed.attempt}.sqlite")
+        assert not queue.renew(crashed.id, "crashed-worker", 60)
+        assert not queue.complete(crashed.id, "crashed-worker", stale_output)
+        assert stale_output not in queue.outputs()
+        queue.close()
+
+        assert merge_shards(config) == {'done': planned}
+        merged = analyze_sites(config, fetch=False).to_frame()
+
+        stub.set_faults()
+        prepare_fetch(single)
+        expected = analyze_sites(single).to_frame()
+    assert merged.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+@pytest.mark.parametrize('granularity, bucket', [
+    ('week', lambda day: day.isocalendar()[:2]),
+    ('month', lambda day: (day.year, day.month)),
+])
+def test_shards_hold_whole_buckets(tmp_path, granularity, bucket):
+    config = load_config(base={'output_prefix': str(tmp_path / granularity), 'capture_granularity': granularity,
+                               'start_date': "2023-03-01", 'end_date': "2023-12-20", 'shard_days': 10})
+    plan_shards(config)
+    queue = WorkQueue(queue_path(config))
+    shards = queue.connection.execute("SELECT start_day, end_day FROM shards ORDER BY id").fetchall()
+    queue.close()
+    days = [(datetime.strptime(start, "%Y%m%d"), datetime.strptime(end, "%Y%m%d")) for start, end in shards]
+    assert days[0][0] == config['start_date'] and days[-1][1] == config['end_date']
+    for (_, previous_end), (next_start, _) in zip(days, days[1:]):
+        assert next_start == previous_end + timedelta(days=1)
+        assert bucket(next_start) != bucket(previous_end)  # No week or month is split between shards
@@ -0,0 +1,26 @@
+import pytest
+from vacancies.charts import PLOTLY_JS
+from vacancies.config import CHOICES, load_config
+from vacancies.exporters import EXPORT_EXTENSIONS
+from vacancies.reports import REPORTS
+from vacancies.results_table import BUCKET_LABELS
+from vacancies.wayback import CAPTURE_BUCKETS
+
+
+def test_choices_match_registries():
+    assert set(CHOICES['report']) == set(REPORTS)
+    assert set(CHOICES['capture_granularity']) == set(CAPTURE_BUCKETS)
+    assert set(CHOICES['chart_bucket']) == set(BUCKET_LABELS)
+    assert set(CHOICES['plotly_js']) == set(PLOTLY_JS)
+    assert set(CHOICES['export_format']) == set(EXPORT_EXTENSIONS)
+
+
+@pytest.mark.parametrize('key', sorted(CHOICES))
+def test_unknown_choice_is_rejected(key):
+    with pytest.raises(ValueError, match=f"Unknown {key}: bogus \\(known: {', '.join(CHOICES[key])}\\)"):
+        load_config(base={key: 'bogus'})
+
+
+def test_defaults_load():
+    config = load_config()
+    assert all(config[key] in choices for key, choices in CHOICES.items())
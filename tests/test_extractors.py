@@ -0,0 +1,14 @@
+from vacancies.extractors import STREAM_LIMITS, extract_titles
+
+
+def test_extractors_match_legacy(fixtures):
+    # The fast and streaming extractors against the legacy html.parser ones on every
+    # fixture. Streaming is also run with tiny chunks, splitting tags and text
+    for fixture in fixtures:
+        args = (fixture['website_url'], fixture['html'], fixture['capture_date'])
+        legacy_titles = extract_titles(*args, legacy=True)
+        assert legacy_titles, fixture['file']
+        assert extract_titles(*args) == legacy_titles, fixture['file']
+        assert extract_titles(*args, stream_limits=STREAM_LIMITS) == legacy_titles, fixture['file']
+        assert extract_titles(*args, stream_limits=dict(STREAM_LIMITS, chunk_bytes=7)) == legacy_titles, \
+            fixture['file']
@@ -0,0 +1,32 @@
+import random
+from vacancies.matcher import KeywordMatcher
+
+WORDS = ["Senior", "Middle", "Junior", "Intern", "Internship", "Chief", "Lead", "QA", "Головний", "Старший",
+         "Молодший", "СТАРШИЙ", "developer", "Python", "İstanbul", "ß", "", "a", "in"]
+
+
+def counts_loop(keywords, titles):
+    # The per-keyword loop KeywordMatcher.hit_counts replaced
+    counts = dict.fromkeys(keywords, 0)
+    for title in titles:
+        for keyword in keywords:
+            if keyword.lower() in title.lower():
+                counts[keyword] += 1
+    return counts
+
+
+def sets_loop(keywords, titles):
+    # The per-keyword loop KeywordMatcher.hit_sets replaced
+    return {keyword: {title.lower() for title in titles if keyword.lower() in title.lower()} for keyword in keywords}
+
+
+def test_matcher_matches_substring_loops():
+    # Random titles and keyword lists: overlapping, differently cased, Cyrillic and empty keywords
+    rng = random.Random(0)
+    for _ in range(300):
+        keywords = rng.sample(WORDS, rng.randint(1, 8))
+        titles = [" ".join(rng.choice(WORDS) if rng.random() < 0.7 else rng.choice(WORDS).upper()
+                           for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(0, 40))]
+        matcher = KeywordMatcher(keywords)
+        assert matcher.hit_counts(titles) == counts_loop(keywords, titles), (keywords, titles)
+        assert matcher.hit_sets(titles) == sets_loop(keywords, titles), (keywords, titles)
@@ -0,0 +1,48 @@
+from datetime import datetime
+import tldextract
+from vacancies import charts
+from vacancies.reports import combined_chart
+from vacancies.results_table import ResultsTable
+
+SITES = ["https://djinni.co/jobs/?primary_keyword=Python", "https://www.work.ua/jobs-python/"]
+KEYWORDS = ["Senior", "Middle", "Junior", "Lead"]
+# Quantity per site, keyword and day: Senior has no positions on djinni's first day and
+# Lead none at all on work.ua
+QUANTITIES = {
+    SITES[0]: {"Senior": [0, 4, 2], "Middle": [3, 0, 5], "Junior": [1, 1, 0], "Lead": [2, 2, 2]},
+    SITES[1]: {"Senior": [5, 6, 7], "Middle": [0, 0, 1], "Junior": [2, 0, 0], "Lead": [0, 0, 0]},
+}
+DAYS = ["20240101", "20240102", "20240103"]
+
+
+def baseline_trace_names(quantities, percentages):
+    # Legend of the original create_chart: sites in order, each site's keywords in order,
+    # keywords without a single position left out
+    names = []
+    for website_url, keyword_quantities in quantities.items():
+        extracted = tldextract.extract(website_url)
+        for keyword, counts in keyword_quantities.items():
+            shares = [percentages[website_url][keyword][day] for day, count in enumerate(counts) if count > 0]
+            if shares:
+                average = sum(share for share in shares if share > 0) / sum(share > 0 for share in shares)
+                names.append(f"{keyword}-{average:.2f}%<br>{extracted.domain}.{extracted.suffix}")
+    return names
+
+
+def test_combined_chart_keeps_keyword_order(tmp_path, monkeypatch):
+    results = ResultsTable()
+    percentages = {}
+    for website_url, keyword_quantities in QUANTITIES.items():
+        percentages[website_url] = {keyword: [] for keyword in KEYWORDS}
+        for day_index, day in enumerate(DAYS):
+            total = sum(counts[day_index] for counts in keyword_quantities.values())
+            for keyword in KEYWORDS:
+                quantity = keyword_quantities[keyword][day_index]
+                percentage = quantity / total * 100 if total else 0
+                percentages[website_url][keyword].append(percentage)
+                results.add(website_url, day, keyword, quantity, percentage, total, total)
+
+    figures = []
+    monkeypatch.setattr(charts, 'write_chart', lambda fig, *args: figures.append(fig))
+    combined_chart(results.to_frame(), datetime(2024, 1, 1), datetime(2024, 1, 3), str(tmp_path / "chart.html"))
+    assert [trace.name for trace in figures[0].data] == baseline_trace_names(QUANTITIES, percentages)
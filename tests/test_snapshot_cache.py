@@ -0,0 +1,34 @@
+from datetime import timedelta
+from vacancies import wayback
+from vacancies.snapshot_cache import SnapshotCache
+from vacancies.stub_server import StubWaybackServer
+
+
+def test_offline_replay(fixtures, tmp_path, monkeypatch):
+    # Fills a cache from a local stub archive, then reruns the same range during a CDX
+    # outage and offline: both must read every page back from the cache
+    days = 5
+    fixture = fixtures[0]
+    first_day = fixture['capture_date']
+    last_day = first_day + timedelta(days=days - 1)
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.setattr(wayback, 'BACKOFF_BASE', 0.05)
+    with StubWaybackServer() as stub:
+        for offset in range(days):
+            # Captured at odd times, so the pages are cached under 14-digit CDX timestamps
+            stub.add_capture(fixture['website_url'], f"{first_day + timedelta(days=offset):%Y%m%d}0{offset}3512",
+                             fixture['html'])
+        monkeypatch.setattr(wayback, 'WAYBACK_HOST', stub.url)
+
+        def replay(cache):
+            wayback.set_cache(cache)
+            requests_before = sum(stub.requests.values())
+            captures = wayback.capture_timestamps(fixture['website_url'], first_day, last_day)
+            fetched = sum(snapshot is not None
+                          for _, snapshot in wayback.fetch_snapshots(fixture['website_url'], captures))
+            return fetched, cache.stats()['hits'], sum(stub.requests.values()) - requests_before
+
+        assert replay(SnapshotCache(cache_dir))[0] == days
+        stub.inject(503, count=3)  # Every CDX attempt fails
+        assert replay(SnapshotCache(cache_dir)) == (days, days, 3)
+        assert replay(SnapshotCache(cache_dir, offline=True)) == (days, days, 0)
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from vacancies import wayback
+from vacancies.stub_server import StubWaybackServer
+
+
+def test_throttle_recovers_from_faults(fixtures, monkeypatch):
+    # Fetches 60 pages from a local stub that throttles above 2 concurrent requests, fails
+    # 15% of requests with 503 and adds latency, then breaks the host outright
+    days = 60
+    fixture = fixtures[0]
+    timestamps = [(fixture['capture_date'] + timedelta(days=offset)).strftime("%Y%m%d") for offset in range(days)]
+    monkeypatch.setitem(wayback.THROTTLE_SETTINGS, 'rate', 50.0)
+    monkeypatch.setitem(wayback.THROTTLE_SETTINGS, 'cooldown', 2.0)
+    monkeypatch.setattr(wayback, 'BACKOFF_BASE', 0.05)
+    wayback.configure_fetch(max_workers=8, max_per_host=8)
+    with StubWaybackServer() as stub:
+        for timestamp in timestamps:
+            stub.add_capture(fixture['website_url'], f"{timestamp}120000", fixture['html'])
+        stub.set_faults(error_rate=0.15, latency=0.02, max_concurrent=2, retry_after=1, seed=1)
+        monkeypatch.setattr(wayback, 'WAYBACK_HOST', stub.url)
+
+        # Until the throttle has backed off to 2, about 4 in 10 requests fail: 6 tries
+        # per page left one page of 60 without a success every few runs
+        fetched = sum(snapshot is not None for _, snapshot in wayback.fetch_snapshots(
+            fixture['website_url'], timestamps, max_workers=8, max_retries=10))
+        assert fetched == days
+        throttle = wayback.host_throttle(stub.url)
+        assert throttle.stats['throttled'] > 0
+
+        stub.set_faults()
+        stub.inject(503, count=throttle.failure_threshold + 2)
+        snapshot = wayback.get_archived_snapshot(fixture['website_url'], timestamps[0], max_retries=10)
+        assert snapshot is not None
+        assert throttle.stats['circuit_opens'] > 0
@@ -0,0 +1,4 @@
+# Keyword shares in job listings archived by the Wayback Machine. Modules are imported
+# on demand: cli.py is the command line, config.py the run settings.
+
+__version__ = "0.1.0"
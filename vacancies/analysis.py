@@ -0,0 +1,102 @@
+from tqdm import tqdm
+from .metrics import METRICS, COUNT_BUCKETS, warn
+from .pipeline import ByteBudget, analyze_snapshots
+from .results_table import ResultsTable
+from .wayback import capture_timestamps, fetch_snapshots
+
+# Keyword shares per site and day, shared by every report: captures are listed, fetched,
+# parsed and counted (see pipeline.py), days already in the results store are reused,
+# and one row per day and keyword is appended to a ResultsTable.
+
+
+def analyze_position_percentage(website_url, keywords, start_date, end_date, max_workers=8, capture_granularity='day',
+                                collapse_duplicates=False, raw=False, snapshot_costs=None, processes=None, store=None,
+                                fetch=True, results=None, distinct=False, share_of='positions', totals_by_day=None, stream_limits=None, max_buffered_bytes=None):
+    # Rows are appended to `results` (a new ResultsTable when None), which is returned.
+    # distinct counts each lowercased title once per keyword. share_of: percentages of all
+    # 'positions' listed that day or of the day's 'keywords' matches. totals_by_day, when
+    # given, sums the keyword matches per day over every site analysed with it
+    # (total_quantity_all). stream_limits streams pages in and parses them without a full
+    # document tree, skipping any page over stream_limits['max_page_bytes'], with at most
+    # max_buffered_bytes of pages (never less than one page) held between download and parsing
+    results = results if results is not None else ResultsTable()
+
+    # Days already in the results store are not fetched or parsed again; days stored for
+    # another keyword list are recounted from their saved titles
+    days = store.load_days(website_url, keywords, start_date, end_date, distinct=distinct) if store else {}
+
+    # fetch=False rebuilds the results from the store alone
+    captures = capture_timestamps(website_url, start_date, end_date, capture_granularity, raw=raw) if fetch else []
+    captures = [capture for capture in captures if capture[:8] not in days]
+    METRICS.inc('days', len(days), site=website_url, source='store')
+    max_page_bytes = stream_limits['max_page_bytes'] if stream_limits else None
+    budget = None
+    if stream_limits and max_buffered_bytes:
+        budget = ByteBudget(max(max_buffered_bytes, max_page_bytes))
+    snapshots = fetch_snapshots(website_url, captures, max_workers=max_workers, raw=raw, max_page_bytes=max_page_bytes,
+                                budget=budget)
+    # Extraction and keyword counting run in a process pool
+    analyzed = analyze_snapshots(website_url, snapshots, keywords, distinct=distinct, processes=processes,
+                                 keep_titles=store is not None, stream_limits=stream_limits, budget=budget)
+    with tqdm(total=len(captures), desc=f"Analyzing {website_url}", unit="day") as pbar:
+        for capture, snapshot, parsed, reused in analyzed:
+            timestamp = capture[:8]
+
+            if snapshot:
+                try:
+                    total_positions, keyword_counts, parse_seconds, titles = parsed.result()
+                    if reused:
+                        parse_seconds = 0.0  # Same page as an earlier capture, counts were reused
+                        METRICS.inc('pages_reused', site=website_url)
+                    else:
+                        METRICS.observe('stage_seconds', parse_seconds, stage='parse', site=website_url)
+                    METRICS.observe('positions_per_page', total_positions, buckets=COUNT_BUCKETS, site=website_url)
+
+                    if snapshot_costs is not None:
+                        snapshot_costs.append({
+                            'website': website_url,
+                            'timestamp': timestamp,
+                            'capture': snapshot.capture_timestamp,
+                            'wire_bytes': snapshot.wire_bytes,
+                            'size_bytes': snapshot.size_bytes,
+                            'parse_seconds': parse_seconds
+                        })
+
+                    days[timestamp] = (snapshot.capture_timestamp, total_positions, keyword_counts)
+                    if store:
+                        store.save_day(website_url, timestamp, snapshot.capture_timestamp, snapshot.digest,
+                                       total_positions, keyword_counts, titles)
+                    METRICS.inc('days', site=website_url, source='fetched')
+                    pbar.update(1)
+
+                except Exception as e:
+                    METRICS.inc('days', site=website_url, source='failed')
+                    warn(f"Error processing {website_url} at {timestamp}: {str(e)}")
+            else:
+                METRICS.inc('days', site=website_url, source='failed')
+
+    first_day_of_capture = {}  # Resolved capture timestamp -> first day it was served for
+    for timestamp in sorted(days):
+        capture_timestamp, total_positions, keyword_counts = days[timestamp]
+        duplicate_of = first_day_of_capture.setdefault(capture_timestamp, timestamp)
+        duplicate_of = duplicate_of if duplicate_of != timestamp else None
+        if duplicate_of and collapse_duplicates:
+            continue
+
+        total_keyword_positions = sum(keyword_counts.values())
+        total_quantity_all = 0
+        if totals_by_day is not None:
+            totals_by_day[timestamp] = total_quantity_all = totals_by_day.get(timestamp, 0) + total_keyword_positions
+        share_base = total_positions if share_of == 'positions' else total_keyword_positions
+
+        for keyword in keywords:
+            quantity = keyword_counts[keyword]
+
+            percentage = (quantity / share_base) * 100 if share_base > 0 else 0
+
+            results.add(website_url, timestamp, keyword, quantity, percentage,
+                        total_positions=total_positions, total_keyword_positions=total_keyword_positions,
+                        total_quantity_all=total_quantity_all, capture_date=capture_timestamp[:8],
+                        duplicate_of=duplicate_of)
+
+    return results
@@ -0,0 +1,284 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from .config import output_file, site_keywords, stream_limits
+from .metrics import METRICS, info, set_quiet, warn, write_run_report
+
+# Sharded backfill. `plan` splits the (site x date range) space of a config into shards
+# of shard_days (extended to whole weeks or months with that capture_granularity) in a
+# SQLite work queue (<output_prefix>_queue.sqlite). Any number of `work` processes, on
+# this host or on others sharing the files, claim shards under a lease they keep
+# renewing while the shard runs. A shard whose worker dies is claimed again once its
+# lease expires; one that fails, or leaves days it could not fetch, goes back to the
+# queue until max_attempts. Each attempt writes its days to its own results
+# store under <output_prefix>_shards/, starting from the days of the shard's last
+# recorded attempt so a retry only fetches what is missing. A worker that lost its lease
+# only ever writes to its own attempt's file, which the queue then refuses to record.
+# `merge` folds the recorded stores into <output_prefix>_results.sqlite for the chart
+# and export.
+#
+# The archive throttles per IP, so the speedup comes from workers on separate hosts;
+# several workers on one host share its rate limit.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    website TEXT NOT NULL,
+    keywords TEXT NOT NULL,
+    start_day TEXT NOT NULL,
+    end_day TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    output TEXT,
+    error TEXT,
+    UNIQUE (website, start_day, end_day)
+);
+"""
+
+# previous_output: results store of the last recorded attempt, None before there is one
+Shard = namedtuple('Shard', ['id', 'website_url', 'keywords', 'start_date', 'end_date', 'attempt',
+                             'previous_output'])
+
+
+class WorkQueue:
+    # Shard states: pending -> leased -> done, or back to pending on failure and failed
+    # after max_attempts
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, website_url, keywords, start_date, end_date):
+        # Planning the same shard twice keeps the first one and its progress
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO shards (website, keywords, start_day, end_day) VALUES (?, ?, ?, ?)",
+                (website_url, json.dumps(keywords, ensure_ascii=False), start_date.strftime("%Y%m%d"),
+                 end_date.strftime("%Y%m%d")))
+
+    def claim(self, worker, lease_seconds):
+        # Next pending shard, or one whose lease ran out, leased to `worker`; None when
+        # there is nothing left to claim
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")  # Keeps other workers out until the lease is written
+            self.connection.execute(
+                "UPDATE shards SET status = 'failed', worker = NULL, error = 'lease expired' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, self.max_attempts))
+            row = self.connection.execute(
+                "SELECT id, website, keywords, start_day, end_day, attempts, output FROM shards "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)).fetchone()
+            if row is None:
+                return None
+            shard_id, website_url, keywords, start_day, end_day, attempts, previous_output = row
+            self.connection.execute(
+                "UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (worker, now + lease_seconds, shard_id))
+        return Shard(shard_id, website_url, json.loads(keywords), datetime.strptime(start_day, "%Y%m%d"),
+                     datetime.strptime(end_day, "%Y%m%d"), attempts + 1, previous_output)
+
+    def renew(self, shard_id, worker, lease_seconds):
+        # False once the lease is lost, e.g. it expired and another worker took the shard
+        with self.connection:
+            renewed = self.connection.execute(
+                "UPDATE shards SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_seconds, shard_id, worker))
+        return renewed.rowcount == 1
+
+    def complete(self, shard_id, worker, output):
+        with self.connection:
+            completed = self.connection.execute(
+                "UPDATE shards SET status = 'done', output = ?, error = NULL, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'leased'", (output, shard_id, worker))
+        return completed.rowcount == 1
+
+    def fail(self, shard_id, worker, error, output=None):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, lease_expires = NULL, error = ?, output = COALESCE(?, output) "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, output, shard_id, worker))
+
+    def status(self):
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM shards GROUP BY status"))
+
+    def completed_by(self, workers):
+        # Shards the named workers completed
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM shards WHERE status = 'done' AND worker IN ({', '.join('?' * len(workers))})",
+            list(workers)).fetchone()[0]
+
+    def outputs(self):
+        # Shard stores to merge in shard order, failed shards' partial results included
+        return [output for (output,) in self.connection.execute(
+            "SELECT output FROM shards WHERE output IS NOT NULL ORDER BY id")]
+
+
+def queue_path(config):
+    return output_file(config, "queue.sqlite")
+
+
+def bucket_end(day, granularity):
+    # Last day of the capture_granularity bucket (ISO week or calendar month) `day` is in
+    if granularity == 'week':
+        return day + timedelta(days=6 - day.weekday())
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return day
+
+
+def plan_shards(config):
+    # Queues every site's date range in shard_days pieces; returns the number of shards.
+    # A shard ends with a whole week or month bucket, so each bucket's capture is picked
+    # from the same days as in a single run
+    queue = WorkQueue(queue_path(config), config['max_attempts'])
+    planned = 0
+    try:
+        for website_url, keywords in site_keywords(config):
+            start_date = config['start_date']
+            while start_date <= config['end_date']:
+                end_date = bucket_end(start_date + timedelta(days=config['shard_days'] - 1),
+                                      config['capture_granularity'])
+                end_date = min(end_date, config['end_date'])
+                queue.add(website_url, keywords, start_date, end_date)
+                planned += 1
+                start_date = end_date + timedelta(days=1)
+        print(f"Planned {planned} shards in {queue.path}: {queue.status()}")
+    finally:
+        queue.close()
+    return planned
+
+
+def keep_lease(path, shard_id, worker, lease_seconds, stop):
+    # Heartbeat thread, with its own connection as sqlite3 connections stay in their thread
+    queue = WorkQueue(path)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(shard_id, worker, lease_seconds):
+                warn(f"{worker} lost the lease on shard {shard_id}, this attempt will not be recorded")
+                return
+    finally:
+        queue.close()
+
+
+def run_shard(config, shard, output):
+    # Returns the number of days that could not be fetched or parsed
+    from .analysis import analyze_position_percentage
+    from .reports import get_report
+    from .results_store import ResultsStore
+
+    report = get_report(config['report'])
+    failed_before = METRICS.value('days', site=shard.website_url, source='failed')
+    store = ResultsStore(output)
+    try:
+        if shard.previous_output and os.path.exists(shard.previous_output):
+            store.merge(shard.previous_output)  # Days an earlier attempt already has
+        with METRICS.timer('stage_seconds', stage='shard', site=shard.website_url):
+            analyze_position_percentage(shard.website_url, shard.keywords, shard.start_date, shard.end_date,
+                                        config['max_workers'], config['capture_granularity'],
+                                        config['collapse_duplicates'], config['raw_snapshots'], None,
+                                        config['parse_processes'], store, True, None, report.distinct,
+                                        report.share_of, None, stream_limits(config), config['max_buffered_bytes'])
+    finally:
+        store.close()
+    return METRICS.value('days', site=shard.website_url, source='failed') - failed_before
+
+
+def run_worker(config, worker=None, quiet=False):
+    # Claims and runs shards until the queue has none left; returns the shards completed
+    from .cli import prepare_fetch
+
+    set_quiet(quiet)
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    shard_dir = output_file(config, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+    prepare_fetch(config)
+    queue = WorkQueue(queue_path(config), config['max_attempts'])
+    completed = 0
+    try:
+        while True:
+            shard = queue.claim(worker, config['lease_seconds'])
+            if shard is None:
+                break
+            info(f"{worker}: shard {shard.id}, {shard.website_url} {shard.start_date:%Y-%m-%d}..{shard.end_date:%Y-%m-%d}"
+                 f" (attempt {shard.attempt})")
+            output = os.path.join(shard_dir, f"shard_{shard.id}_{shard.attempt}.sqlite")
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=keep_lease, daemon=True,
+                                         args=(queue.path, shard.id, worker, config['lease_seconds'], stop))
+            heartbeat.start()
+            try:
+                failed_days = run_shard(config, shard, output)
+            except Exception as err:
+                METRICS.inc('shards', site=shard.website_url, result='error')
+                warn(f"{worker}: shard {shard.id} failed: {err}")
+                queue.fail(shard.id, worker, str(err), output)
+            else:
+                if failed_days:
+                    METRICS.inc('shards', site=shard.website_url, result='incomplete')
+                    queue.fail(shard.id, worker, f"{failed_days} days could not be fetched or parsed", output)
+                elif queue.complete(shard.id, worker, output):
+                    METRICS.inc('shards', site=shard.website_url, result='done')
+                    completed += 1
+            finally:
+                stop.set()
+                heartbeat.join()
+    finally:
+        queue.close()
+    write_run_report(os.path.join(shard_dir, f"worker_{worker}_report.json"), worker=worker, completed=completed)
+    return completed
+
+
+def run_workers(config, workers=1, quiet=False):
+    # `workers` local worker processes, or the current process when workers is 1; returns
+    # the shards they completed
+    if workers <= 1:
+        return run_worker(config, quiet=quiet)
+    context = multiprocessing.get_context('spawn')
+    names = [f"{socket.gethostname()}-{os.getpid()}-{index}" for index in range(workers)]
+    processes = [context.Process(target=run_worker, args=(config, name, quiet)) for name in names]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    queue = WorkQueue(queue_path(config), config['max_attempts'])
+    try:
+        return queue.completed_by(names)
+    finally:
+        queue.close()
+
+
+def merge_shards(config):
+    # Folds every shard store into <output_prefix>_results.sqlite; returns the queue status
+    from .results_store import ResultsStore
+
+    queue = WorkQueue(queue_path(config), config['max_attempts'])
+    store = ResultsStore(output_file(config, "results.sqlite"))
+    try:
+        outputs = queue.outputs()
+        for output in outputs:
+            store.merge(output)
+        status = queue.status()
+    finally:
+        store.close()
+        queue.close()
+    unfinished = {state: count for state, count in status.items() if state != 'done'}
+    if unfinished:
+        warn(f"Merged {len(outputs)} shards, but not every shard is done: {unfinished}")
+    else:
+        print(f"Merged {len(outputs)} shards into {store.path}")
+    return status
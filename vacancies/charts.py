@@ -0,0 +1,56 @@
+from collections import defaultdict
+import os
+import time
+import plotly
+import plotly.graph_objects as go
+
+# Chart output helpers shared by the reports. Long traces are drawn with WebGL, and the
+# plotly.js bundle (~3.5 MB) can be written once next to the charts instead of into each one.
+
+PLOTLY_BUNDLE = f"plotly-{plotly.__version__}.min.js"
+WEBGL_MIN_POINTS = 1000  # Any trace this long switches the chart to WebGL traces
+PLOTLY_JS = {'inline': True, 'shared': PLOTLY_BUNDLE, 'cdn': 'cdn'}  # plotly_js -> write_html's include_plotlyjs
+
+
+def stack_values(traces):
+    # Scattergl has no stackgroup: stack the y values the way plotly would, summing
+    # every earlier trace's value at the same x
+    stacked = defaultdict(float)
+    for trace in traces:
+        y_values = []
+        for x, y in zip(trace['x'], trace['y']):
+            stacked[x] += y
+            y_values.append(stacked[x])
+        trace['y'] = y_values
+
+
+def add_stacked_traces(fig, traces, webgl=False):
+    # traces: go.Scatter keyword arguments with stackgroup set. webgl=True draws them as
+    # go.Scattergl once a trace reaches WEBGL_MIN_POINTS points
+    if webgl and any(len(trace['x']) >= WEBGL_MIN_POINTS for trace in traces):
+        stack_values(traces)
+        for index, trace in enumerate(traces):
+            trace.pop('stackgroup', None)
+            fig.add_trace(go.Scattergl(fill='tonexty' if index else 'tozeroy', **trace))
+    else:
+        for trace in traces:
+            fig.add_trace(go.Scatter(**trace))
+
+
+def write_chart(fig, output_file, plotly_js="inline", started=None):
+    # plotly_js: 'inline' embeds plotly.js in the file, 'shared' writes PLOTLY_BUNDLE once
+    # next to it and references that, 'cdn' loads it from the plotly CDN.
+    # Returns (file size in bytes, seconds since `started` or spent writing)
+    started = started if started is not None else time.perf_counter()
+    include_plotlyjs = PLOTLY_JS[plotly_js]
+    if plotly_js == 'shared':
+        bundle = os.path.join(os.path.dirname(os.path.abspath(output_file)), PLOTLY_BUNDLE)
+        if not os.path.exists(bundle):
+            with open(bundle, "w", encoding="utf-8") as f:
+                f.write(plotly.offline.get_plotlyjs())
+
+    fig.write_html(output_file, include_plotlyjs=include_plotlyjs)
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(output_file)
+    print(f"Chart saved to {output_file} ({size / 1024:.0f} KiB, {seconds:.2f} s)")
+    return size, seconds
@@ -0,0 +1,219 @@
+import argparse
+import warnings
+from .config import load_config, output_file, site_keywords, stream_limits
+from .metrics import METRICS, info, set_quiet, write_run_report
+
+# Command line interface, installed as `vacancies` (or python -m vacancies):
+#
+#   vacancies fetch   --config run.json   download the captures in range into the snapshot cache
+#   vacancies analyze --config run.json   count keywords in every capture into the results store
+#   vacancies render  --config run.json   chart the stored results
+#   vacancies export  --config run.json   export the stored results
+#   vacancies run     --config run.json   analyze, render and export, what the scripts do
+#
+#   vacancies plan    --config run.json   queue the date range in shards for a backfill
+#   vacancies work    --config run.json   run queued shards until none are left (on any number of hosts)
+#   vacancies merge   --config run.json   merge the finished shards into the results store, render and export
+#
+# Each command imports what it needs when it runs: fetch never loads pandas, plotly or
+# the HTML parsers, and nothing but the combined chart loads tldextract. Every command
+# writes <output_prefix>_<command>_report.json.
+
+
+def prepare_fetch(config):
+    # Points the fetch code at the configured archive and snapshot cache, with the
+    # connection pool and per-host throttles sized for the configured concurrency
+    from . import wayback
+    from .snapshot_cache import SnapshotCache
+
+    wayback.WAYBACK_HOST = config['wayback_host']
+    wayback.configure_fetch(config['max_workers'], config['max_per_host'])
+    cache = SnapshotCache(config['cache_dir'], max_bytes=config['cache_max_bytes'], offline=config['offline'])
+    wayback.set_cache(cache)
+    return cache
+
+
+def analyze_sites(config, resume=False, fetch=True, snapshot_costs=None):
+    # ResultsTable for every configured site. fetch=False rebuilds it from the results
+    # store alone, otherwise the store is cleared for the date range unless resuming
+    from .analysis import analyze_position_percentage
+    from .reports import get_report
+    from .results_store import ResultsStore
+    from .results_table import ResultsTable
+
+    report = get_report(config['report'])
+    start_date, end_date = config['start_date'], config['end_date']
+    store = ResultsStore(output_file(config, "results.sqlite"))
+    results = ResultsTable()  # One row per site, day and keyword
+    totals_by_day = {}  # Keyword matches of all sites per day
+    try:
+        for website_url, keywords in site_keywords(config):
+            info(f"\nAnalyzing {website_url}...")
+            if fetch and not resume:
+                store.clear(website_url, start_date, end_date)
+            with METRICS.timer('stage_seconds', stage='analyze', site=website_url):
+                analyze_position_percentage(website_url, keywords, start_date, end_date, config['max_workers'],
+                                            config['capture_granularity'], config['collapse_duplicates'],
+                                            config['raw_snapshots'], snapshot_costs, config['parse_processes'], store,
+                                            fetch, results, report.distinct, report.share_of, totals_by_day,
+                                            stream_limits(config), config['max_buffered_bytes'])
+    finally:
+        store.close()
+    return results
+
+
+def render_chart(config, table):
+    from .reports import get_report
+
+    chart_file = output_file(config, "chart.html")
+    with METRICS.timer('stage_seconds', stage='chart'):
+        get_report(config['report']).create_chart(table, config['start_date'], config['end_date'], chart_file,
+                                                  bucket=config['chart_bucket'], light=config['light_chart'],
+                                                  plotly_js=config['plotly_js'])
+    return chart_file
+
+
+def export_data(config, table):
+    from .exporters import EXPORT_EXTENSIONS
+    from .reports import export_results
+
+    export_format = config['export_format']
+    export_file = output_file(config, f"data{EXPORT_EXTENSIONS[export_format]}")
+    with METRICS.timer('stage_seconds', stage='export'):
+        export_results(table, config['report'], export_file, export_format)
+    return export_file
+
+
+def fetch(config, args):
+    # Fills the snapshot cache only; a later analyze or run reads the pages from there
+    from tqdm import tqdm
+    from .wayback import capture_timestamps, fetch_snapshots, throttle_stats
+
+    cache = prepare_fetch(config)
+    limits = stream_limits(config)
+    fetched = failed = 0
+    for website_url, _ in site_keywords(config):
+        captures = capture_timestamps(website_url, config['start_date'], config['end_date'],
+                                      config['capture_granularity'], config['raw_snapshots'])
+        with METRICS.timer('stage_seconds', stage='download', site=website_url), \
+                tqdm(total=len(captures), desc=f"Fetching {website_url}", unit="day") as pbar:
+            for _, snapshot in fetch_snapshots(website_url, captures, max_workers=config['max_workers'],
+                                               raw=config['raw_snapshots'],
+                                               max_page_bytes=limits['max_page_bytes'] if limits else None):
+                fetched += snapshot is not None
+                failed += snapshot is None
+                pbar.update(1)
+    print(f"Snapshot cache: {cache.stats()}")
+    return {'fetched': fetched, 'failed': failed, 'snapshot_cache': cache.stats(), 'throttles': throttle_stats()}
+
+
+def analyze(config, args):
+    from .wayback import report_snapshot_costs, throttle_stats
+
+    cache = prepare_fetch(config)
+    snapshot_costs = []  # Bytes transferred and parse time per snapshot
+    results = analyze_sites(config, args.resume, snapshot_costs=snapshot_costs)
+    print(f"Snapshot cache: {cache.stats()}")
+    report_snapshot_costs(snapshot_costs, output_file(config, "snapshot_costs.csv"))
+    return {'rows': len(results), 'snapshot_cache': cache.stats(), 'throttles': throttle_stats(),
+            'outputs': [output_file(config, "results.sqlite")]}
+
+
+def render(config, args):
+    table = analyze_sites(config, fetch=False).to_frame()
+    return {'rows': len(table), 'outputs': [render_chart(config, table)]}
+
+
+def export(config, args):
+    table = analyze_sites(config, fetch=False).to_frame()
+    return {'rows': len(table), 'outputs': [export_data(config, table)]}
+
+
+def run(config, args):
+    from .wayback import report_snapshot_costs, throttle_stats
+
+    cache = prepare_fetch(config)
+    snapshot_costs = []  # Bytes transferred and parse time per snapshot
+    results = analyze_sites(config, args.resume, not args.from_store, snapshot_costs)
+    print(f"Snapshot cache: {cache.stats()}")
+    report_snapshot_costs(snapshot_costs, output_file(config, "snapshot_costs.csv"))
+
+    table = results.to_frame()
+    outputs = [render_chart(config, table), export_data(config, table)]
+    return {'rows': len(table), 'snapshot_cache': cache.stats(), 'throttles': throttle_stats(), 'outputs': outputs}
+
+
+def plan(config, args):
+    from .backfill import plan_shards, queue_path
+
+    return {'shards': plan_shards(config), 'outputs': [queue_path(config)]}
+
+
+def work(config, args):
+    from .backfill import run_worker, run_workers
+
+    if args.worker:
+        return {'worker': args.worker, 'completed': run_worker(config, args.worker, args.quiet)}
+    return {'workers': args.workers, 'completed': run_workers(config, args.workers, args.quiet)}
+
+
+def merge(config, args):
+    from .backfill import merge_shards
+
+    status = merge_shards(config)
+    table = analyze_sites(config, fetch=False).to_frame()
+    outputs = [output_file(config, "results.sqlite"), render_chart(config, table), export_data(config, table)]
+    return {'shards': status, 'rows': len(table), 'outputs': outputs}
+
+
+COMMANDS = {
+    'fetch': (fetch, 'Download the captures in range into the snapshot cache'),
+    'analyze': (analyze, 'Count keywords in every capture and save the days to the results store'),
+    'render': (render, 'Chart the results in the results store'),
+    'export': (export, 'Export the results in the results store'),
+    'run': (run, 'Analyze, render and export in one go'),
+    'plan': (plan, 'Queue the date range of every site in shards for a backfill'),
+    'work': (work, 'Claim and run queued shards until none are left'),
+    'merge': (merge, 'Merge the finished shards into the results store, then render and export'),
+}
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', metavar='PATH', help='JSON run configuration (see config.py for the keys)')
+    common.add_argument('--quiet', action='store_true',
+                        help='Only print warnings and summaries, not a line per request')
+    common.add_argument('--prometheus', metavar='PATH',
+                        help='Also write the run metrics in Prometheus text format to PATH')
+
+    parser = argparse.ArgumentParser(prog='vacancies', description='Keyword shares in archived job listings')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        command = subparsers.add_parser(name, parents=[common], help=help_text, description=help_text)
+        if name in ('analyze', 'run'):
+            command.add_argument('--resume', action='store_true',
+                                 help='Reuse results saved by an earlier or interrupted run and only compute '
+                                      'missing days')
+        if name == 'run':
+            command.add_argument('--from-store', action='store_true',
+                                 help='Build the chart and export from stored results only, recounting saved titles '
+                                      'for new keywords, without fetching or parsing anything')
+        if name == 'work':
+            command.add_argument('--workers', type=int, default=1, metavar='N',
+                                 help='Worker processes to start on this host (default 1)')
+            command.add_argument('--worker', metavar='NAME',
+                                 help='Run a single worker under this name instead of <hostname>-<pid>')
+    return parser
+
+
+def main(argv=None, config=None):
+    # config: settings applied on top of the defaults and under --config, as the scripts pass them
+    args = build_parser().parse_args(argv)
+    set_quiet(args.quiet)
+    warnings.filterwarnings("ignore", category=RuntimeWarning)  # Failed requests are retried and counted
+    config = load_config(args.config, config)
+    details = COMMANDS[args.command][0](config, args)
+    write_run_report(output_file(config, f"{args.command}_report.json"), args.prometheus, command=args.command,
+                     report=config['report'], sites=dict(site_keywords(config)), start_date=config['start_date'],
+                     end_date=config['end_date'], **details)
+    return 0
@@ -0,0 +1,91 @@
+from datetime import datetime
+import json
+from .exporters import EXPORT_EXTENSIONS
+from .sites import get_site
+
+# Run configuration: everything the scripts used to hardcode in main(), as one dict. The
+# CLI reads it from a JSON file (--config) on top of DEFAULTS; dates are "YYYY-MM-DD".
+#
+#   {"report": "combined", "output_prefix": "combined_position",
+#    "sites": {"workua": ["Senior", "Junior"], "djinni": ["Senior", "Junior"]},
+#    "start_date": "2023-01-01", "end_date": "2023-12-31"}
+
+DEFAULTS = {
+    'report': 'positions',  # 'positions' (share of all listed positions) or 'combined' (all sites on one chart)
+    'sites': ['djinni'],  # Site names from sites.py or listing URLs, or {site: [keywords]} per site
+    'keywords': ["Senior", "Middle", "Junior", "Internship"],  # For sites given without their own list
+    'start_date': "2023-01-01",
+    'end_date': "2023-12-21",
+    'output_prefix': "position",  # position_chart.html, position_data.xlsx, position_results.sqlite, ...
+    'max_workers': 8,  # Concurrent snapshot downloads per website
+    'max_per_host': 4,  # Upper bound on simultaneous requests to web.archive.org
+    'capture_granularity': 'day',  # At most one capture per 'day', 'week' or 'month' (results are kept per day)
+    'collapse_duplicates': False,  # Drop days Wayback served from an already seen capture instead of marking them
+    'raw_snapshots': True,  # Fetch original captures (id_) without the Wayback toolbar and rewritten links
+    'parse_processes': None,  # Worker processes for extraction and counting (None = one per core, 0 = inline)
+    'stream_parse': False,  # Read pages in chunks and take titles as they stream by, without a full document tree
+    'max_page_bytes': 32 * 1024 ** 2,  # With stream_parse: larger pages are skipped
+    'max_held_nodes': 100_000,  # With stream_parse: most HTML nodes held at once while reading a position
+    'max_buffered_bytes': 256 * 1024 ** 2,  # With stream_parse: most page bytes held between download and parsing
+    'chart_bucket': 'day',  # One chart point per 'day', 'week' or 'month'
+    'light_chart': False,  # True: compact hover data and WebGL traces for long ranges
+    'plotly_js': 'inline',  # 'inline' embeds plotly.js in the chart, 'shared' writes it once next to it, 'cdn' links it
+    'export_format': 'xlsx',  # 'xlsx', 'xlsx-sites' (one sheet per site), 'csv' or 'parquet'
+    'cache_dir': "snapshot_cache",  # Archived pages are cached on disk
+    'cache_max_bytes': 2 * 1024 ** 3,
+    'offline': False,  # Rerun from the snapshot cache without touching the network
+    'wayback_host': "http://web.archive.org",  # Archive to fetch from, e.g. a local StubWaybackServer
+    'shard_days': 30,  # Backfill: days per shard in the work queue
+    'lease_seconds': 600.0,  # Backfill: a shard whose worker stops renewing its lease for this long is run again
+    'max_attempts': 3,  # Backfill: runs of a shard before it is marked failed
+}
+
+# Allowed values of the settings that pick a report, bucket or output by name, checked
+# when the config is loaded rather than after the analysis has run. Kept here so loading a
+# config does not import pandas or plotly; tests/test_config.py checks them against the
+# registries in reports.py, wayback.py, results_table.py and charts.py
+CHOICES = {
+    'report': ('positions', 'combined'),
+    'capture_granularity': ('day', 'week', 'month'),
+    'chart_bucket': ('day', 'week', 'month'),
+    'plotly_js': ('inline', 'shared', 'cdn'),
+    'export_format': tuple(EXPORT_EXTENSIONS),
+}
+
+
+def load_config(path=None, base=None):
+    # DEFAULTS, updated with `base` (a script's settings) and then the JSON file at `path`
+    config = dict(DEFAULTS)
+    config.update(base or {})
+    if path:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown config keys: {', '.join(sorted(unknown))}")
+    for key, choices in CHOICES.items():
+        if config[key] not in choices:
+            raise ValueError(f"Unknown {key}: {config[key]} (known: {', '.join(choices)})")
+    for key in ('start_date', 'end_date'):
+        if isinstance(config[key], str):
+            config[key] = datetime.strptime(config[key], "%Y-%m-%d")
+    return config
+
+
+def site_keywords(config):
+    # [(listing URL, keywords)] in config order
+    sites = config['sites']
+    if not isinstance(sites, dict):
+        sites = dict.fromkeys(sites)
+    return [(get_site(site).url, keywords or config['keywords']) for site, keywords in sites.items()]
+
+
+def stream_limits(config):
+    # Limits for the streaming extractors, None when stream_parse is off
+    if not config['stream_parse']:
+        return None
+    return {'max_page_bytes': config['max_page_bytes'], 'max_held_nodes': config['max_held_nodes']}
+
+
+def output_file(config, name):
+    return f"{config['output_prefix']}_{name}"
@@ -0,0 +1,104 @@
+import re
+from .metrics import warn
+
+# Export backends for the results table. Each report supplies make_frame, turning a slice
+# of the table into its export columns, and rows are formatted and written CHUNK_ROWS at
+# a time instead of as one DataFrame. The optional pyarrow and xlsxwriter are imported by
+# the writers that need them.
+
+CHUNK_ROWS = 50_000
+EXPORT_EXTENSIONS = {'xlsx': '.xlsx', 'xlsx-sites': '.xlsx', 'csv': '.csv', 'parquet': '.parquet'}
+EXCEL_MAX_ROWS = 1_048_576
+SHEET_NAME_INVALID = re.compile(r"[\[\]:*?/\\]+")
+
+
+def iter_chunks(table, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(table), chunk_rows):
+        yield table.iloc[start:start + chunk_rows]
+
+
+def write_excel(table, make_frame, output_file, chunk_rows=CHUNK_ROWS):
+    # Single sheet through pandas, as export_to_excel has always written it
+    make_frame(table).to_excel(output_file, index=False)
+
+
+def write_csv(table, make_frame, output_file, chunk_rows=CHUNK_ROWS):
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        for index, chunk in enumerate(iter_chunks(table, chunk_rows)):
+            make_frame(chunk).to_csv(f, header=index == 0, index=False)
+        if len(table) == 0:
+            make_frame(table).to_csv(f, index=False)
+
+
+def write_parquet(table, make_frame, output_file, chunk_rows=CHUNK_ROWS):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from None
+    writer = None
+    try:
+        for chunk in iter_chunks(table, chunk_rows):
+            # Later chunks are cast to the first one's schema, e.g. an all-empty Duplicate_Of
+            arrow_table = pa.Table.from_pandas(make_frame(chunk), schema=writer.schema if writer else None,
+                                               preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_file, arrow_table.schema)
+            writer.write_table(arrow_table)
+        if writer is None:
+            pq.write_table(pa.Table.from_pandas(make_frame(table), preserve_index=False), output_file)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def sheet_name(website_url, used):
+    # Excel sheet names: at most 31 characters, none of []:*?/\ and unique in the workbook
+    name = SHEET_NAME_INVALID.sub("_", re.sub(r"^https?://(www\.)?", "", website_url)).strip("_")[:31] or "site"
+    candidate, suffix = name, 1
+    while candidate.lower() in used:
+        suffix += 1
+        candidate = f"{name[:31 - len(str(suffix)) - 1]}_{suffix}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_excel_sheets(table, make_frame, output_file, chunk_rows=CHUNK_ROWS):
+    # One sheet per site, written row by row with xlsxwriter's constant_memory mode
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ImportError("Per-site Excel export needs xlsxwriter (pip install xlsxwriter)") from None
+    workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    used = set()
+    try:
+        for website_url, rows in table.groupby('site', observed=True, sort=False):
+            worksheet = workbook.add_worksheet(sheet_name(str(website_url), used))
+            if len(rows) >= EXCEL_MAX_ROWS:
+                warn(f"Sheet for {website_url} is truncated at {EXCEL_MAX_ROWS} rows")
+                rows = rows.iloc[:EXCEL_MAX_ROWS - 1]
+            worksheet.write_row(0, 0, list(make_frame(rows.iloc[:0]).columns))
+            row_number = 1
+            for chunk in iter_chunks(rows, chunk_rows):
+                frame = make_frame(chunk)
+                frame = frame.astype(object).where(frame.notna(), None)  # Empty cells for NaN/NaT
+                for values in frame.itertuples(index=False):
+                    worksheet.write_row(row_number, 0, values)
+                    row_number += 1
+    finally:
+        workbook.close()
+
+
+EXPORT_WRITERS = {
+    'xlsx': write_excel,
+    'xlsx-sites': write_excel_sheets,
+    'csv': write_csv,
+    'parquet': write_parquet,
+}
+
+
+def export_table(table, make_frame, output_file, export_format='xlsx', chunk_rows=CHUNK_ROWS):
+    if export_format not in EXPORT_WRITERS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    EXPORT_WRITERS[export_format](table, make_frame, output_file, chunk_rows)
+    print(f"Data exported to {output_file}")
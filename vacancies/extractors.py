@@ -0,0 +1,250 @@
+from datetime import datetime
+import json
+import os
+import re
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional, fall back to the html.parser extractors
+    etree = None
+
+# Per-site job title extraction. Each site registers a fast extractor working on an lxml
+# tree (parsed in C, only the matching nodes are visited from Python) and the legacy
+# BeautifulSoup/html.parser version it must agree with. Both return the list of title
+# strings for a snapshot, one entry per listed position.
+#
+# Sites can also register how to recognise a position while the page streams through
+# lxml's pull parser (stream_titles): titles are taken as each position element closes
+# and every finished node outside a position is dropped, so no full document tree is
+# ever held. stream_limits caps the page size and the nodes held at once.
+
+DJINNI_NEW_LAYOUT = datetime(2023, 8, 17)
+LINKEDIN_CARD_CLASS = ("base-card relative w-full hover:no-underline focus:no-underline base-card--link "
+                       "base-search-card base-search-card--link job-search-card")
+
+ASCII_SPACES = ' \n\t\x0c\r'
+XPATH_SPACES = re.compile(r"[ \t\r\n]+")  # What normalize-space() collapses
+
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_LIMITS = {
+    'max_page_bytes': 32 * 1024 ** 2,  # Larger pages are not parsed
+    'max_held_nodes': 100_000,  # Nodes kept for the positions being read
+}
+
+EXTRACTORS = {}  # Domain fragment -> (fast extractor, legacy extractor, stream items)
+
+
+class PageTooLarge(ValueError):
+    pass
+
+
+def register_extractor(domain, fast, legacy, stream_items=None):
+    # stream_items(capture_date) -> (is_position(tag, attrib), title(element)), where
+    # title returns None for positions that are skipped
+    EXTRACTORS[domain] = (fast, legacy, stream_items)
+
+
+def get_extractor(website_url, legacy=False, stream_limits=None):
+    # stream_limits: a dict like STREAM_LIMITS to parse incrementally, when the site and
+    # lxml support it
+    for domain, (fast, legacy_extractor, stream_items) in EXTRACTORS.items():
+        if domain in website_url:
+            if legacy or etree is None:
+                return legacy_extractor
+            if stream_limits is not None and stream_items is not None:
+                return lambda html, capture_date: stream_titles(html, *stream_items(capture_date), **stream_limits)
+            return fast
+    raise ValueError(f"Unsupported website: {website_url}")
+
+
+def extract_titles(website_url, html, capture_date, legacy=False, stream_limits=None):
+    return get_extractor(website_url, legacy, stream_limits)(html, capture_date)
+
+
+def parse_tree(html):
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    parser = etree.HTMLParser(encoding='utf-8')
+    return etree.fromstring(html, parser) if html.strip() else None
+
+
+def make_soup(html):
+    from bs4 import BeautifulSoup  # Only the legacy extractors need it
+
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    return BeautifulSoup(html, 'html.parser')
+
+
+def has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if etree is not None:
+    # BeautifulSoup's .text skips script, style and template contents, so does this
+    element_text = etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+    djinni_new_items = etree.XPath(f"//div[{has_class('job-list-item')}]")
+    djinni_old_items = etree.XPath(f"//li[{has_class('list-jobs__item')}]")
+    workua_items = etree.XPath("//h2[@class and normalize-space(@class)='']")
+    workua_link = etree.XPath("(.//a)[1]")
+    linkedin_cards = etree.XPath(f"//div[normalize-space(@class)='{LINKEDIN_CARD_CLASS}']")
+    linkedin_title = etree.XPath(f"(.//h3[{has_class('base-search-card__title')}])[1]")
+
+
+def normalize_space(value):
+    return XPATH_SPACES.sub(' ', value).strip(' ')
+
+
+def has_class_token(attrib, name):
+    return name in XPATH_SPACES.split(attrib.get('class', ''))
+
+
+def stream_titles(html, is_position, title, max_page_bytes=STREAM_LIMITS['max_page_bytes'],
+                  max_held_nodes=STREAM_LIMITS['max_held_nodes'], chunk_bytes=STREAM_CHUNK_BYTES):
+    # Feeds the page to lxml's pull parser chunk by chunk. Positions are numbered when they
+    # open, so nested ones come out in document order like an XPath query
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    if len(html) > max_page_bytes:
+        raise PageTooLarge(f"Page of {len(html)} bytes is over the {max_page_bytes} byte limit")
+    if not html.strip():
+        return []
+
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+    titles = []
+    open_positions = []  # (element, index in titles) of the positions being read
+    held = 0
+
+    def read_events():
+        nonlocal held
+        for event, element in parser.read_events():
+            if event == 'start':
+                if is_position(element.tag, element.attrib):
+                    open_positions.append((element, len(titles)))
+                    titles.append(None)
+                if open_positions:
+                    held += 1
+                    if held > max_held_nodes:
+                        raise PageTooLarge(f"Position with over {max_held_nodes} nodes")
+                continue
+
+            if open_positions and open_positions[-1][0] is element:
+                titles[open_positions.pop()[1]] = title(element)
+            if not open_positions:
+                # Nothing later can be inside a closed element: drop it and what came before
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                held = 0
+
+    for offset in range(0, len(html), chunk_bytes):
+        parser.feed(html[offset:offset + chunk_bytes])
+        read_events()
+    parser.close()
+    read_events()
+    return [title for title in titles if title is not None]
+
+
+def text_of(element):
+    # BeautifulSoup collapses whitespace-only strings to a single newline or space
+    return "".join(('\n' if '\n' in text else ' ') if not text.strip(ASCII_SPACES) else text
+                   for text in element_text(element))
+
+
+def djinni_titles(html, capture_date):
+    root = parse_tree(html)
+    if root is None:
+        return []
+    items = djinni_new_items(root) if capture_date >= DJINNI_NEW_LAYOUT else djinni_old_items(root)
+    return [text_of(item) for item in items]
+
+
+def djinni_titles_legacy(html, capture_date):
+    soup = make_soup(html)
+    if capture_date >= DJINNI_NEW_LAYOUT:
+        positions = soup.find_all('div', class_='job-list-item')
+    else:
+        positions = soup.find_all('li', class_='list-jobs__item')
+    return [position.text for position in positions]
+
+
+def djinni_stream_items(capture_date):
+    if capture_date >= DJINNI_NEW_LAYOUT:
+        return lambda tag, attrib: tag == 'div' and has_class_token(attrib, 'job-list-item'), text_of
+    return lambda tag, attrib: tag == 'li' and has_class_token(attrib, 'list-jobs__item'), text_of
+
+
+def workua_titles(html, capture_date):
+    # Headings without a link still count as positions, with an empty title
+    root = parse_tree(html)
+    if root is None:
+        return []
+    titles = []
+    for heading in workua_items(root):
+        link = workua_link(heading)
+        titles.append(text_of(link[0]) if link else '')
+    return titles
+
+
+def workua_titles_legacy(html, capture_date):
+    soup = make_soup(html)
+    return [position.a.get_text() if position.a else '' for position in soup.find_all('h2', class_='')]
+
+
+def workua_stream_items(capture_date):
+    def title(heading):
+        link = workua_link(heading)
+        return text_of(link[0]) if link else ''
+
+    return lambda tag, attrib: tag == 'h2' and 'class' in attrib and not normalize_space(attrib['class']), title
+
+
+def linkedin_titles(html, capture_date):
+    root = parse_tree(html)
+    if root is None:
+        return []
+    titles = []
+    for card in linkedin_cards(root):
+        title = linkedin_title(card)
+        if title:
+            job_title = text_of(title[0]).strip()
+            if job_title:
+                titles.append(job_title)
+    return titles
+
+
+def linkedin_titles_legacy(html, capture_date):
+    soup = make_soup(html)
+    titles = []
+    for job in soup.find_all("div", class_=LINKEDIN_CARD_CLASS):
+        title_container = job.find("h3", class_="base-search-card__title")
+        if title_container:
+            job_title = title_container.text.strip()
+            if job_title:
+                titles.append(job_title)
+    return titles
+
+
+def linkedin_stream_items(capture_date):
+    def title(card):
+        title_element = linkedin_title(card)
+        job_title = text_of(title_element[0]).strip() if title_element else ''
+        return job_title or None
+
+    return lambda tag, attrib: tag == 'div' and normalize_space(attrib.get('class', '')) == LINKEDIN_CARD_CLASS, title
+
+
+register_extractor('djinni.co', djinni_titles, djinni_titles_legacy, djinni_stream_items)
+register_extractor('work.ua', workua_titles, workua_titles_legacy, workua_stream_items)
+register_extractor('linkedin.com', linkedin_titles, linkedin_titles_legacy, linkedin_stream_items)
+
+
+def load_fixtures(fixtures_dir):
+    # Recorded snapshots listed in fixtures.json as {file, website_url, timestamp}
+    with open(os.path.join(fixtures_dir, "fixtures.json"), encoding="utf-8") as f:
+        fixtures = json.load(f)
+    for fixture in fixtures:
+        with open(os.path.join(fixtures_dir, fixture['file']), encoding="utf-8") as f:
+            fixture['html'] = f.read()
+        fixture['capture_date'] = datetime.strptime(fixture['timestamp'][:8], "%Y%m%d")
+    return fixtures
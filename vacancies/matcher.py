@@ -0,0 +1,30 @@
+
+
+class KeywordMatcher:
+    # Counts the titles containing each keyword. Each title is lowered once with str.lower
+    # (the same Unicode-aware folding as before, so Cyrillic keywords such as "Старший"
+    # match "СТАРШИЙ") and tested with `in` against the keywords lowered up front, instead
+    # of lowering the title and the keyword again for every keyword. Keywords that lower
+    # to the same text are tested once.
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.pairs = [(keyword, keyword.lower()) for keyword in self.keywords]
+        self.lowered = list(dict.fromkeys(lowered for _, lowered in self.pairs))
+
+    def hit_sets(self, titles):
+        # Keyword -> set of lowercased titles containing it
+        hits = {lowered: set() for lowered in self.lowered}
+        for text in set(map(str.lower, titles)):
+            for lowered in self.lowered:
+                if lowered in text:
+                    hits[lowered].add(text)
+        return {keyword: set(hits[lowered]) for keyword, lowered in self.pairs}
+
+    def hit_counts(self, titles):
+        # Keyword -> number of titles containing it, counting repeated titles every time
+        counts = dict.fromkeys(self.lowered, 0)
+        for text in map(str.lower, titles):
+            for lowered in self.lowered:
+                if lowered in text:
+                    counts[lowered] += 1
+        return {keyword: counts[lowered] for keyword, lowered in self.pairs}
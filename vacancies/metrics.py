@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from datetime import datetime
+import bisect
+import json
+import threading
+import time
+from tqdm import tqdm
+
+# Run instrumentation: counters and histograms keyed by name and labels (stage, site,
+# ...), shared by every module through METRICS. At the end of a run they go into a JSON
+# report and, optionally, a Prometheus text file.
+#
+# info() replaces the per-request print() calls. It writes through tqdm so progress bars
+# stay intact, and set_quiet(True) silences it; warn() is always shown.
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = tuple(1024 * 4 ** power for power in range(9))  # 1 KiB .. 64 MiB
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_quiet = False
+
+
+def set_quiet(quiet=True):
+    global _quiet
+    _quiet = quiet
+
+
+def info(message):
+    if not _quiet:
+        tqdm.write(message)
+
+
+def warn(message):
+    tqdm.write(message)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def cumulative(self):
+        # (upper bound, observations <= bound) pairs, Prometheus style
+        total = 0
+        pairs = []
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}  # (name, sorted label items) -> value
+            self.histograms = {}  # (name, sorted label items) -> Histogram
+            self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def value(self, name, **labels):
+        with self._lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{
+                'name': name,
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'mean': histogram.sum / histogram.count if histogram.count else None,
+                'min': histogram.min,
+                'max': histogram.max,
+                'buckets': {str(bound): count for bound, count in histogram.cumulative()},
+            } for (name, labels), histogram in sorted(self.histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self, prefix="vacancies_"):
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{prefix}{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{prefix}{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{metric}_bucket{format_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+METRICS = Metrics()
+
+
+def write_run_report(output_file, prometheus_file=None, **details):
+    # JSON report of the run: timing, the given details and every metric
+    finished = time.time()
+    report = {
+        'started': datetime.fromtimestamp(METRICS.started).isoformat(timespec='seconds'),
+        'finished': datetime.fromtimestamp(finished).isoformat(timespec='seconds'),
+        'duration_seconds': finished - METRICS.started,
+    }
+    report.update(details)
+    report['metrics'] = METRICS.snapshot()
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"Run report saved to {output_file}")
+    if prometheus_file:
+        with open(prometheus_file, "w", encoding="utf-8") as f:
+            f.write(METRICS.to_prometheus())
+        print(f"Prometheus metrics saved to {prometheus_file}")
+    return report
@@ -0,0 +1,141 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+import queue
+import threading
+import time
+from .extractors import extract_titles
+from .matcher import KeywordMatcher
+
+# Streaming fetch -> parse -> aggregate pipeline. A thread drains the fetcher into a
+# bounded queue, a process pool turns raw HTML bytes into compact keyword counts, and the
+# caller aggregates the results, which are yielded in the order the snapshots were fetched.
+
+_DONE = object()
+_matchers = {}  # Per worker process: keywords tuple -> KeywordMatcher
+
+
+class ByteBudget:
+    # Page bytes held at once between download and the end of parsing. Downloads reserve
+    # max_page_bytes before they start and hand back what the page did not use; the rest
+    # is released once the page is parsed (see fetch_snapshots and analyze_snapshots)
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.held = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size, blocking=True):
+        # False when the budget cannot take `size` more bytes and blocking is off
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.held + size <= self.max_bytes, None if blocking else 0):
+                return False
+            self.held += size
+            return True
+
+    def release(self, size):
+        with self._condition:
+            self.held -= size
+            self._condition.notify_all()
+
+
+class FetchFailure:
+    def __init__(self, error):
+        self.error = error
+
+
+def count_titles(website_url, html, capture_date, keywords, distinct, keep_titles=False, stream_limits=None):
+    # Runs in a worker process: returns (positions found, {keyword: count}, seconds spent,
+    # the titles themselves when keep_titles is set or None). stream_limits switches to
+    # the streaming extractors (see extractors.py)
+    started = time.perf_counter()
+    if keywords not in _matchers:
+        _matchers[keywords] = KeywordMatcher(keywords)
+    matcher = _matchers[keywords]
+
+    titles = extract_titles(website_url, html, capture_date, stream_limits=stream_limits)
+    if distinct:
+        counts = {keyword: len(hits) for keyword, hits in matcher.hit_sets(titles).items()}
+    else:
+        counts = matcher.hit_counts(titles)
+    return len(titles), counts, time.perf_counter() - started, titles if keep_titles else None
+
+
+def run_inline(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as err:
+        future.set_exception(err)
+    return future
+
+
+def fetch_stage(snapshots, fetched):
+    try:
+        for item in snapshots:
+            fetched.put(item)
+    except Exception as err:
+        fetched.put(FetchFailure(err))
+    finally:
+        fetched.put(_DONE)
+
+
+def analyze_snapshots(website_url, snapshots, keywords, distinct=False, processes=None, queue_size=32,
+                      keep_titles=False, stream_limits=None, budget=None):
+    # snapshots: iterable of (capture, Snapshot or None) such as wayback.fetch_snapshots.
+    # Yields (capture, snapshot, future, reused) in input order. The snapshot comes back
+    # without its html, and future.result() gives count_titles' tuple or raises the
+    # parse error. reused is True when an identical page (same digest) was already parsed.
+    # processes=0 parses in the calling process. budget: the ByteBudget the snapshots
+    # were fetched under, released as each page is parsed or found to be a repeat.
+    keywords = tuple(keywords)
+    fetched = queue.Queue(maxsize=queue_size)
+    executor = None
+    if processes != 0:
+        # spawn keeps workers independent of the fetch threads (and matches Windows)
+        executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(snapshot):
+        capture_date = datetime.strptime(snapshot.capture_timestamp[:8], "%Y%m%d")
+        html = snapshot.html if isinstance(snapshot.html, bytes) else snapshot.html.encode('utf-8')
+        args = (website_url, html, capture_date, keywords, distinct, keep_titles, stream_limits)
+        return executor.submit(count_titles, *args) if executor else run_inline(count_titles, *args)
+
+    threading.Thread(target=fetch_stage, args=(snapshots, fetched), daemon=True).start()
+    parsed = {}  # Digest -> future, so repeated pages are parsed once
+    pending = deque()
+    try:
+        while True:
+            item = fetched.get()
+            if item is _DONE:
+                break
+            if isinstance(item, FetchFailure):
+                raise item.error
+
+            capture, snapshot = item
+            del item
+            future, reused = None, False
+            if snapshot:
+                reused = snapshot.digest in parsed
+                if not reused:
+                    parsed[snapshot.digest] = submit(snapshot)
+                future = parsed[snapshot.digest]
+                if budget is not None:
+                    # The page is held until its parse ends (the pool keeps the call's arguments)
+                    size = snapshot.size_bytes
+                    if reused:
+                        budget.release(size)
+                    else:
+                        future.add_done_callback(lambda _, size=size: budget.release(size))
+                snapshot = snapshot._replace(html=None)  # Only the counts travel further
+            pending.append((capture, snapshot, future, reused))
+
+            # Hand back finished results in order, and block once the window is full
+            while pending and (len(pending) > queue_size or pending[0][2] is None or pending[0][2].done()):
+                yield pending.popleft()
+
+        while pending:
+            yield pending.popleft()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,235 @@
+from collections import namedtuple
+import time
+import pandas as pd
+from .exporters import export_table
+from .results_table import (as_results_table, bucket_table, day_labels, keyword_summary, running_quantity,
+                            site_keyword_order, stacked_percentages)
+
+# The two reports the scripts produced, as a registry the CLI picks from by name:
+#   positions  keyword share of all positions listed on each site (VacancyUPD.py)
+#   combined   share of the day's keyword matches, every site stacked on one chart
+#              (UPD vacancies LinkedIn WorkUA & DjjiniCo.py)
+# plotly (and tldextract) are imported by the chart functions, so analysing or exporting
+# does not load them.
+
+Report = namedtuple('Report', ['distinct', 'share_of', 'create_chart', 'export_rows'])
+
+
+def positions_chart(results, start_date, end_date, output_file="position_chart.html", bucket='day', light=False,
+                    plotly_js='inline'):
+    # bucket: 'day', 'week' or 'month' per point. light=True sends the hover values as
+    # customdata with one template per trace and uses WebGL for long traces
+    import plotly.graph_objects as go
+    from .charts import add_stacked_traces, write_chart
+
+    started = time.perf_counter()
+    fig = go.Figure()
+
+    table = bucket_table(as_results_table(results), bucket)
+    summary = keyword_summary(table)
+    max_percentage = table['percentage'].max() if len(table) else 0
+    website_url = ""
+    x_values_dates = []
+    traces = []
+
+    for (website_url, keyword), rows in table.groupby(['site', 'keyword'], observed=True, sort=False):
+        total_quantity, average_percentage = summary.loc[(website_url, keyword), ['total_quantity', 'average_percentage']]
+
+        # Days from the highest percentage down
+        rows = rows.sort_values('percentage', ascending=False, kind='stable')
+        x_values_dates = day_labels(rows['date'], bucket)
+        y_values_percentage = rows['percentage'].tolist()
+        quantities = rows['quantity'].tolist()
+
+        # Create a single trace for each keyword with the entire set of values
+        trace = dict(
+            x=x_values_dates,
+            y=y_values_percentage,
+            stackgroup='one',  # Add this line for stacking
+            name=f"{keyword} <br>({average_percentage:.2f}%)",  # Use the actual calculated average_percentage
+            connectgaps=False,  # This option prevents connecting lines for missing values
+        )
+        hover_summary = f'Total: {int(total_quantity)}<br>' + f'Current: {quantities[0]} <br>'
+        if light:
+            # One template per trace, the per-point values travel as numbers
+            trace.update(
+                y=rows['percentage'].to_numpy(),
+                customdata=rows[['quantity', 'percentage']].to_numpy(),
+                hovertemplate=hover_summary + 'Date: %{x}<br>Quantity: %{customdata[0]}<br>Percentage: %{customdata[1]:.2f}%',
+            )
+        else:
+            trace.update(
+                hovertemplate=hover_summary + 'Date: %{text}',
+                text=x_values_dates,
+                hovertext=[f'Date: {date}<br>Quantity: {quantity}<br>Percentage: {percentage:.2f}%'
+                           for date, quantity, percentage in zip(x_values_dates, quantities, y_values_percentage)],
+            )
+        traces.append(trace)
+
+    add_stacked_traces(fig, traces, webgl=light)
+    fig.update_layout(
+        legend=dict(
+            title='Key Words',
+            traceorder='reversed',
+            itemsizing='constant',
+            tracegroupgap=0,
+            borderwidth=0,
+        ),
+        title=f'Key Words in Opened Vacancies ({start_date.strftime("%b %d, %Y")} - {end_date.strftime("%b %d, %Y")}) on {website_url}',
+        xaxis_title='',
+        yaxis_title='%',
+        template='plotly_dark',
+        xaxis=dict(type='category', categoryorder='array', categoryarray=x_values_dates),
+        yaxis_range=[0, max_percentage],  # Set the y-axis range to be between 0 and the maximum percentage
+    )
+
+    return write_chart(fig, output_file, plotly_js, started)
+
+
+def positions_rows(table):
+    # Export columns for rows of the results table
+    return pd.DataFrame({
+        'Year': table['date'].dt.year,
+        'Timestamp': table['date'].dt.strftime("%Y%m%d"),
+        'Percentage': table['percentage'],
+        'Quantity': table['quantity'],
+        'Website': table['site'].astype(str),
+        'Keyword': table['keyword'].astype(str),
+        'Capture_Date': table['capture_date'].fillna(table['date']).dt.strftime("%Y%m%d"),
+        'Duplicate_Of': table['duplicate_of'].dt.strftime("%Y%m%d"),
+    })
+
+
+def combined_chart(results, start_date, end_date, output_file="combined_position_chart.html", bucket='day',
+                   light=False, plotly_js='inline'):
+    # Same options as positions_chart
+    import plotly.graph_objects as go
+    import tldextract
+    from .charts import add_stacked_traces, write_chart
+
+    started = time.perf_counter()
+    fig = go.Figure()
+
+    # Days where a keyword had no positions are left out of the chart. The traces keep the
+    # order the sites and keywords were analysed in, taken before that, so a keyword with
+    # no positions on the first days does not move down the legend
+    table = as_results_table(results)
+    trace_order = list(table[['site', 'keyword']].drop_duplicates().itertuples(index=False, name=None))
+    table = bucket_table(table[table['quantity'] > 0], bucket)
+    table = table.assign(total_quantity=running_quantity(table), stacked_percentage=stacked_percentages(table))
+    summary = keyword_summary(table)
+    max_percentage = table['percentage'].max() if len(table) else 0
+    all_dates = sorted(set(day_labels(table['date'], bucket)))
+    legend_entries = set()
+    traces = []
+
+    groups = dict(list(table.groupby(['site', 'keyword'], observed=True, sort=False)))
+    for website_url, keyword in trace_order:
+        if (website_url, keyword) not in groups:
+            continue  # No positions on any day
+        average_percentage = summary.at[(website_url, keyword), 'average_percentage']
+
+        rows = groups[website_url, keyword].sort_values('date', kind='stable')
+        x_values_dates = day_labels(rows['date'], bucket)
+        # Each keyword is stacked on top of the same keyword of the sites before it
+        y_values_percentage = rows['stacked_percentage']
+
+        if light:
+            # One template per trace, the per-point values travel as numbers
+            y_values_percentage = y_values_percentage.to_numpy()
+            hover_columns = ['quantity', 'percentage', 'total_quantity', 'total_keyword_positions', 'total_quantity_all']
+            customdata = rows[hover_columns].to_numpy()
+            hover_text = ('  Date: %{x}<br>'
+                          '  Current Quantity:%{customdata[0]}<br>'
+                          '  Current Percentage: %{customdata[1]:.2f}%<br>'
+                          '  Total Quantity: %{customdata[2]}<br>'
+                          '  Total Keywords: %{customdata[3]}<br>'
+                          '  All Positions: %{customdata[4]}<br>')
+        else:
+            y_values_percentage = y_values_percentage.tolist()
+            customdata = None
+            hover_text = [
+                f'  Date: {date}<br>'
+                f'  Current Quantity:{current}<br>'
+                f'  Current Percentage: {percentage:.2f}%<br>'
+                f'  Total Quantity: {total_quantity}<br>'
+                f'  Total Keywords: {total_keywords}<br>'
+                f'  All Positions: {all_positions}<br>'
+                for date, current, percentage, total_quantity, total_keywords, all_positions in zip(
+                    x_values_dates, rows['quantity'].tolist(), rows['percentage'].tolist(),
+                    rows['total_quantity'].tolist(), rows['total_keyword_positions'].tolist(),
+                    rows['total_quantity_all'].tolist())
+            ]
+        extracted_info = tldextract.extract(website_url)
+        domain_name = f"{extracted_info.domain}.{extracted_info.suffix}"
+        legend_entry = (f"{keyword}-{average_percentage:.2f}%<br>{domain_name}", average_percentage)
+        if legend_entry not in legend_entries:
+            trace_percentage = dict(
+                x=x_values_dates,
+                y=y_values_percentage,
+                stackgroup='one',
+                name=f"{keyword}-{average_percentage:.2f}%<br>{domain_name}",
+                hovertemplate=hover_text,
+                connectgaps=False,
+                mode='markers+lines',  # Set mode to 'markers+lines' to show markers
+                marker=dict(size=3),  # Adjust the marker size here (e.g., size=5)
+            )
+            if light:
+                trace_percentage['customdata'] = customdata
+            else:
+                trace_percentage['text'] = x_values_dates
+
+            traces.append(trace_percentage)
+            legend_entries.add(legend_entry)
+
+    add_stacked_traces(fig, traces, webgl=light)
+    fig.update_layout(
+        legend=dict(
+            title='Key Words',
+            traceorder='reversed',
+            itemsizing='constant',
+            tracegroupgap=0,
+            borderwidth=0,
+        ),
+        title=f'Key Words in Opened Vacancies ({start_date.strftime("%b %d, %Y")} - {end_date.strftime("%b %d, %Y")})',
+        yaxis_title='%',
+        template='plotly_dark',
+        xaxis=dict(type='category', categoryorder='array', categoryarray=all_dates),
+        yaxis_range=[0, max_percentage+1],
+    )
+
+    return write_chart(fig, output_file, plotly_js, started)
+
+
+def combined_rows(table):
+    # Export columns for rows of the results table
+    return pd.DataFrame({
+        'Website': table['site'].astype(str),
+        'Keyword': table['keyword'].astype(str),
+        'Quantity': table['quantity'],
+        'Percentage': table['percentage'],
+        'Total_Positions_All_Keywords': table['total_keyword_positions'],
+        'Total_Quantity_All_Positions': table['total_quantity_all'],
+        'Date': table['date'].dt.strftime('%Y-%m-%d'),
+        'Capture_Date': table['capture_date'].fillna(table['date']).dt.strftime("%Y%m%d"),
+        'Duplicate_Of': table['duplicate_of'].dt.strftime("%Y%m%d"),
+    })
+
+
+REPORTS = {
+    'positions': Report(distinct=False, share_of='positions', create_chart=positions_chart,
+                        export_rows=positions_rows),
+    'combined': Report(distinct=True, share_of='keywords', create_chart=combined_chart, export_rows=combined_rows),
+}
+
+
+def get_report(name):
+    if name not in REPORTS:
+        raise ValueError(f"Unknown report: {name} (known reports: {', '.join(REPORTS)})")
+    return REPORTS[name]
+
+
+def export_results(results, report, output_file="position_data.xlsx", export_format='xlsx'):
+    # export_format: 'xlsx', 'xlsx-sites' (one sheet per site), 'csv' or 'parquet'
+    export_table(site_keyword_order(as_results_table(results)), get_report(report).export_rows, output_file,
+                 export_format)
@@ -0,0 +1,175 @@
+import json
+import re
+import sqlite3
+import zlib
+from .matcher import KeywordMatcher
+
+# Per-(site, day, keyword) results saved as each day finishes, so a crashed run can be
+# resumed and a wider date range only computes the days that are not stored yet.
+#
+# The extracted job titles are kept too, once per distinct page (digest), zlib-compressed,
+# with an inverted index from lowercased word tokens to pages. Counts for keywords that
+# were not part of the original run are then recomputed from the stored titles: the index
+# narrows each keyword down to pages with a token containing every token of the keyword
+# and only those pages' titles are matched.
+
+TOKEN = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    website TEXT NOT NULL,
+    day TEXT NOT NULL,
+    capture_timestamp TEXT NOT NULL,
+    digest TEXT,
+    total_positions INTEGER NOT NULL,
+    PRIMARY KEY (website, day)
+);
+CREATE TABLE IF NOT EXISTS keyword_counts (
+    website TEXT NOT NULL,
+    day TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (website, day, keyword)
+);
+CREATE TABLE IF NOT EXISTS titles (
+    digest TEXT PRIMARY KEY,
+    titles BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS title_tokens (
+    token TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (token, digest)
+) WITHOUT ROWID;
+"""
+
+
+class ResultsStore:
+    def __init__(self, path="results.sqlite"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def save_day(self, website_url, day, capture_timestamp, digest, total_positions, keyword_counts, titles=None):
+        with self.connection:  # One transaction per day
+            self.connection.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                (website_url, day, capture_timestamp, digest, total_positions))
+            self.save_counts(website_url, day, keyword_counts)
+            if titles is not None and digest:
+                self.save_titles(digest, titles)
+
+    def save_counts(self, website_url, day, keyword_counts):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO keyword_counts VALUES (?, ?, ?, ?)",
+            [(website_url, day, keyword, quantity) for keyword, quantity in keyword_counts.items()])
+
+    def save_titles(self, digest, titles):
+        inserted = self.connection.execute(
+            "INSERT OR IGNORE INTO titles VALUES (?, ?)",
+            (digest, zlib.compress(json.dumps(titles, ensure_ascii=False).encode('utf-8'))))
+        if inserted.rowcount:
+            tokens = {token for title in titles for token in TOKEN.findall(title.lower())}
+            self.connection.executemany("INSERT OR IGNORE INTO title_tokens VALUES (?, ?)",
+                                        [(token, digest) for token in tokens])
+
+    def load_titles(self, digest):
+        row = self.connection.execute("SELECT titles FROM titles WHERE digest = ?", (digest,)).fetchone()
+        return json.loads(zlib.decompress(row[0]).decode('utf-8')) if row else None
+
+    def keyword_candidates(self, keyword, vocabulary):
+        # Digests whose titles may contain `keyword`, or None when the index cannot tell
+        candidates = None
+        for keyword_token in TOKEN.findall(keyword.lower()):
+            tokens = [token for token in vocabulary if keyword_token in token]
+            digests = set()
+            for offset in range(0, len(tokens), 500):  # Stay below SQLite's parameter limit
+                chunk = tokens[offset:offset + 500]
+                digests.update(digest for (digest,) in self.connection.execute(
+                    f"SELECT DISTINCT digest FROM title_tokens WHERE token IN ({','.join('?' * len(chunk))})", chunk))
+            candidates = digests if candidates is None else candidates & digests
+        return candidates
+
+    def recount(self, website_url, keywords, start_date, end_date, distinct=False, days=None):
+        # Recomputes keyword counts from stored titles, without fetching or parsing HTML.
+        # distinct=True counts distinct lowercased titles, like the combined report does.
+        # Returns the same mapping as load_days for every stored day with titles
+        # (restricted to `days` when given).
+        rows = self.connection.execute(
+            "SELECT s.day, s.capture_timestamp, s.digest, s.total_positions FROM snapshots s "
+            "JOIN titles t ON t.digest = s.digest WHERE s.website = ? AND s.day BETWEEN ? AND ?",
+            (website_url, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))).fetchall()
+        if days is not None:
+            rows = [row for row in rows if row[0] in days]
+        if not rows:
+            return {}
+
+        vocabulary = [token for (token,) in self.connection.execute("SELECT DISTINCT token FROM title_tokens")]
+        candidates = {keyword: self.keyword_candidates(keyword, vocabulary) for keyword in keywords}
+        matchers = {}
+        counts_by_digest = {}
+        recounted = {}
+        for day, capture_timestamp, digest, total_positions in rows:
+            if digest not in counts_by_digest:
+                counts = dict.fromkeys(keywords, 0)
+                needed = tuple(keyword for keyword in keywords
+                               if candidates[keyword] is None or digest in candidates[keyword])
+                if needed:
+                    if needed not in matchers:
+                        matchers[needed] = KeywordMatcher(needed)
+                    titles = self.load_titles(digest)
+                    if distinct:
+                        counts.update({keyword: len(hits) for keyword, hits in matchers[needed].hit_sets(titles).items()})
+                    else:
+                        counts.update(matchers[needed].hit_counts(titles))
+                counts_by_digest[digest] = counts
+            recounted[day] = (capture_timestamp, total_positions, counts_by_digest[digest])
+        return recounted
+
+    def load_days(self, website_url, keywords, start_date, end_date, distinct=False):
+        # day -> (capture_timestamp, total_positions, {keyword: quantity}) for the days in
+        # range that have a count for every keyword. Days missing some keywords are
+        # recounted from their stored titles; anything else has to be recomputed
+        rows = self.connection.execute(
+            "SELECT s.day, s.capture_timestamp, s.total_positions, k.keyword, k.quantity "
+            "FROM snapshots s JOIN keyword_counts k ON k.website = s.website AND k.day = s.day "
+            "WHERE s.website = ? AND s.day BETWEEN ? AND ?",
+            (website_url, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d")))
+        days = {}
+        for day, capture_timestamp, total_positions, keyword, quantity in rows:
+            days.setdefault(day, (capture_timestamp, total_positions, {}))[2][keyword] = quantity
+        complete = {day: (capture_timestamp, total_positions, {keyword: counts[keyword] for keyword in keywords})
+                    for day, (capture_timestamp, total_positions, counts) in days.items()
+                    if all(keyword in counts for keyword in keywords)}
+
+        incomplete = set(days) - set(complete)
+        if incomplete:
+            recounted = self.recount(website_url, keywords, start_date, end_date, distinct, incomplete)
+            with self.connection:
+                for day, (_, _, counts) in recounted.items():
+                    self.save_counts(website_url, day, counts)
+            complete.update(recounted)
+        return complete
+
+    def merge(self, path):
+        # Copies the days, counts and titles of another store (a backfill shard) into this
+        # one. Its days replace the same days stored here, keyword counts included
+        self.connection.execute("ATTACH DATABASE ? AS other", (path,))
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM keyword_counts WHERE (website, day) IN (SELECT website, day FROM other.snapshots)")
+                self.connection.execute("INSERT OR REPLACE INTO snapshots SELECT * FROM other.snapshots")
+                self.connection.execute("INSERT OR REPLACE INTO keyword_counts SELECT * FROM other.keyword_counts")
+                self.connection.execute("INSERT OR IGNORE INTO titles SELECT * FROM other.titles")
+                self.connection.execute("INSERT OR IGNORE INTO title_tokens SELECT * FROM other.title_tokens")
+        finally:
+            self.connection.execute("DETACH DATABASE other")
+
+    def clear(self, website_url, start_date, end_date):
+        args = (website_url, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        with self.connection:
+            self.connection.execute("DELETE FROM snapshots WHERE website = ? AND day BETWEEN ? AND ?", args)
+            self.connection.execute("DELETE FROM keyword_counts WHERE website = ? AND day BETWEEN ? AND ?", args)
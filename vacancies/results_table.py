@@ -0,0 +1,134 @@
+from array import array
+import numpy as np
+import pandas as pd
+
+# Columnar results: one row per (site, day, keyword) kept in typed arrays while the
+# analysis runs, then turned into a pandas DataFrame for the chart and the exports.
+# Sites and keywords are stored as category codes and days as YYYYMMDD integers, so a
+# row costs about 40 bytes instead of a nested dict per day.
+#
+# DataFrame columns:
+#   site, keyword                 category
+#   date                          datetime64, the analysed day
+#   quantity                      int32, positions matching the keyword
+#   percentage                    float64
+#   total_positions               int32, all positions listed that day
+#   total_keyword_positions       int32, sum of the day's keyword counts
+#   total_quantity_all            int32, keyword positions of every site so far that day
+#   capture_date, duplicate_of    datetime64, NaT when unknown / not a duplicate
+
+
+class ResultsTable:
+    def __init__(self):
+        self.sites = {}  # Site URL -> category code
+        self.keywords = {}  # Keyword -> category code
+        self.columns = {
+            'site': array('I'),
+            'keyword': array('I'),
+            'date': array('I'),
+            'quantity': array('i'),
+            'percentage': array('d'),
+            'total_positions': array('i'),
+            'total_keyword_positions': array('i'),
+            'total_quantity_all': array('i'),
+            'capture_date': array('I'),
+            'duplicate_of': array('I'),
+        }
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    def add(self, website_url, day, keyword, quantity, percentage, total_positions=0, total_keyword_positions=0,
+            total_quantity_all=0, capture_date=None, duplicate_of=None):
+        # day, capture_date and duplicate_of are "YYYYMMDD" strings
+        columns = self.columns
+        columns['site'].append(self.sites.setdefault(website_url, len(self.sites)))
+        columns['keyword'].append(self.keywords.setdefault(keyword, len(self.keywords)))
+        columns['date'].append(int(day))
+        columns['quantity'].append(quantity)
+        columns['percentage'].append(percentage)
+        columns['total_positions'].append(total_positions)
+        columns['total_keyword_positions'].append(total_keyword_positions)
+        columns['total_quantity_all'].append(total_quantity_all)
+        columns['capture_date'].append(int(capture_date) if capture_date else 0)
+        columns['duplicate_of'].append(int(duplicate_of) if duplicate_of else 0)
+
+    def to_frame(self):
+        columns = {name: np.frombuffer(column, dtype=column.typecode) for name, column in self.columns.items()}
+        return pd.DataFrame({
+            'site': pd.Categorical.from_codes(columns['site'], categories=list(self.sites)),
+            'keyword': pd.Categorical.from_codes(columns['keyword'], categories=list(self.keywords)),
+            'date': day_numbers_to_dates(columns['date']),
+            'quantity': columns['quantity'],
+            'percentage': columns['percentage'],
+            'total_positions': columns['total_positions'],
+            'total_keyword_positions': columns['total_keyword_positions'],
+            'total_quantity_all': columns['total_quantity_all'],
+            'capture_date': day_numbers_to_dates(columns['capture_date']),
+            'duplicate_of': day_numbers_to_dates(columns['duplicate_of']),
+        })
+
+
+def day_numbers_to_dates(numbers):
+    # YYYYMMDD integers -> datetime64, 0 becomes NaT
+    numbers = numbers.astype(np.int64)
+    return pd.to_datetime(pd.DataFrame({'year': numbers // 10000, 'month': numbers // 100 % 100, 'day': numbers % 100}),
+                          errors='coerce').astype('datetime64[s]')
+
+
+def as_results_table(results):
+    # Accepts a DataFrame from ResultsTable.to_frame or a ResultsTable
+    if isinstance(results, pd.DataFrame):
+        return results
+    return results.to_frame()
+
+
+BUCKET_PERIODS = {'week': 'W', 'month': 'M'}  # Chart buckets other than 'day' -> pandas period
+BUCKET_LABELS = {'day': "%Y%m%d", 'week': "%G-W%V", 'month': "%Y-%m"}
+
+
+def day_labels(dates, bucket='day'):
+    # datetime64 column -> list of labels for the chart's x axis, "YYYYMMDD" for days
+    return dates.dt.strftime(BUCKET_LABELS[bucket or 'day']).tolist()
+
+
+def bucket_table(table, bucket='day'):
+    # One row per (site, keyword, week or month) dated by the bucket's first day, in
+    # order of appearance: quantities and totals summed, percentage averaged over the
+    # days. 'day' (or None) returns the table as is.
+    if bucket in (None, 'day'):
+        return table
+    period_start = table['date'].dt.to_period(BUCKET_PERIODS[bucket]).dt.start_time.astype('datetime64[s]')
+    grouped = table.assign(date=period_start).groupby(['site', 'keyword', 'date'], observed=True, sort=False)
+    return grouped.agg(quantity=('quantity', 'sum'), percentage=('percentage', 'mean'),
+                       total_positions=('total_positions', 'sum'),
+                       total_keyword_positions=('total_keyword_positions', 'sum'),
+                       total_quantity_all=('total_quantity_all', 'sum'), capture_date=('capture_date', 'max'),
+                       duplicate_of=('duplicate_of', 'first')).reset_index()
+
+
+def keyword_summary(table):
+    # Per (site, keyword), in the order they were added: total quantity, average
+    # percentage over the days with a non-zero percentage, maximum percentage, days
+    grouped = table.assign(positive=table['percentage'].where(table['percentage'] > 0)).groupby(
+        ['site', 'keyword'], observed=True, sort=False)
+    summary = grouped.agg(total_quantity=('quantity', 'sum'), average_percentage=('positive', 'mean'),
+                          max_percentage=('percentage', 'max'), days=('date', 'size'))
+    summary['average_percentage'] = summary['average_percentage'].fillna(0.0)
+    return summary
+
+
+def running_quantity(table):
+    # Cumulative quantity of each (site, keyword) in row order
+    return table.groupby(['site', 'keyword'], observed=True, sort=False)['quantity'].cumsum()
+
+
+def stacked_percentages(table):
+    # Percentage of each keyword on a day summed over the sites up to and including this row's
+    return table.groupby(['keyword', 'date'], observed=True, sort=False)['percentage'].cumsum()
+
+
+def site_keyword_order(table):
+    # Rows regrouped by (site, keyword) in order of first appearance, by date within a group
+    group = table.groupby(['site', 'keyword'], observed=True, sort=False).ngroup()
+    return table.assign(group=group).sort_values(['group', 'date'], kind='stable').drop(columns='group')
@@ -0,0 +1,30 @@
+from collections import namedtuple
+
+# Site adapters: the short name used in configs and on the command line, the listing URL
+# that is looked up in the archive and the domain its title extractors are registered
+# under in extractors.py. Adding a site means writing its extractors, registering them
+# there and registering the site here.
+
+SiteAdapter = namedtuple('SiteAdapter', ['name', 'url', 'domain'])
+
+SITES = {}  # Name -> SiteAdapter
+
+
+def register_site(name, url, domain):
+    SITES[name] = SiteAdapter(name, url, domain)
+
+
+def get_site(site):
+    # A registered name, or a listing URL of a registered domain
+    if site in SITES:
+        return SITES[site]
+    for adapter in SITES.values():
+        if adapter.domain in site:
+            return adapter._replace(url=site)
+    raise ValueError(f"Unsupported website: {site} (known sites: {', '.join(SITES)})")
+
+
+register_site('djinni', 'https://djinni.co/jobs/', 'djinni.co')
+register_site('workua', 'https://work.ua/jobs-it/', 'work.ua')
+register_site('linkedin', 'https://www.linkedin.com/jobs/search/?keywords={job_title}&location={Ukraine}',
+              'linkedin.com')
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import os
+import threading
+
+# Share of max_bytes an eviction pass trims the cache down to, so the next pass (a full
+# scan of the cache directory) only comes after that much has been added again
+EVICT_TO = 0.9
+
+
+class SnapshotCache:
+    # Archived snapshots never change, so pages are stored gzip-compressed on disk
+    # keyed by (site URL, timestamp, Wayback mode) and evicted least-recently-used past max_bytes.
+    # A per-site index of the cached timestamps lets offline runs list captures without CDX.
+    def __init__(self, cache_dir="snapshot_cache", max_bytes=2 * 1024 ** 3, offline=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "index"), exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    def _path(self, website_url, timestamp, mode=""):
+        digest = hashlib.sha256(f"{website_url}|{timestamp}{mode}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.html.gz")
+
+    def _index_path(self, website_url):
+        digest = hashlib.sha256(website_url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "index", f"{digest}.tsv")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".html.gz"):
+                    yield os.path.join(root, name)
+
+    def get(self, website_url, timestamp, mode="", binary=False):
+        # Returns (capture_timestamp, html); capture_timestamp is None for entries
+        # written before resolved captures were recorded. binary=True returns the html as
+        # the UTF-8 bytes stored
+        path = self._path(website_url, timestamp, mode)
+        try:
+            with gzip.open(path, "rb") as f:
+                content = f.read()
+        except (FileNotFoundError, OSError, EOFError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except FileNotFoundError:
+            pass  # Evicted meanwhile by another process sharing the cache
+        with self._lock:
+            self.hits += 1
+        header, _, body = content.partition(b"\n")
+        if len(header) == 14 and header.isdigit():
+            capture_timestamp = header.decode("ascii")
+        else:
+            capture_timestamp, body = None, content
+        return capture_timestamp, body if binary else body.decode("utf-8", errors="replace")
+
+    def put(self, website_url, timestamp, html, capture_timestamp=None, mode=""):
+        # html: str, or UTF-8 bytes as streamed pages come
+        path = self._path(website_url, timestamp, mode)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # Unique across threads and processes
+        with gzip.open(tmp_path, "wb") as f:
+            if capture_timestamp:
+                f.write(f"{capture_timestamp}\n".encode("ascii"))
+            f.write(html if isinstance(html, bytes) else html.encode("utf-8"))
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            if os.path.exists(path):
+                self._size -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self._size += size
+            # One short append per page, safe alongside other processes sharing the cache
+            with open(self._index_path(website_url), "a", encoding="utf-8") as f:
+                f.write(f"{timestamp}\t{mode}\n")
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def timestamps(self, website_url, mode=""):
+        # Timestamps still cached for website_url in `mode`, oldest first
+        try:
+            with open(self._index_path(website_url), encoding="utf-8") as f:
+                entries = {line.rstrip("\n").partition("\t")[::2] for line in f}
+        except FileNotFoundError:
+            return []
+        return sorted(timestamp for timestamp, entry_mode in entries
+                      if entry_mode == mode and os.path.exists(self._path(website_url, timestamp, mode)))
+
+    def _evict(self):
+        # Re-measures the cache while scanning it, since other processes may share it,
+        # then removes the least recently used pages down to EVICT_TO of max_bytes
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # Already evicted by another process
+            self._size -= size
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size_bytes': self._size,
+        }
@@ -0,0 +1,185 @@
+from collections import Counter, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+import json
+import random
+import re
+import threading
+import time
+
+# Local stand-in for web.archive.org: serves a CDX listing and archived pages from
+# in-memory captures so the fetch code can be exercised without the live archive.
+# Point wayback.WAYBACK_HOST at StubWaybackServer.url to use it. set_faults and inject make
+# it misbehave like the real archive under load: 429s, 5xx errors and slow responses.
+
+WEB_PATH = re.compile(r"^/web/(\d{1,14})([a-z_]*)/(.*)$")
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 refuses connections when a fetch pool opens a burst
+    # of them at once, which would count as archive failures
+    request_queue_size = 128
+
+
+class StubWaybackServer:
+    def __init__(self, captures=None, host="127.0.0.1", port=0):
+        # captures: {website_url: {14-digit timestamp: html}}
+        self.captures = {unquote(url): dict(pages) for url, pages in (captures or {}).items()}
+        self.requests = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.set_faults()
+        self._injected = deque()  # (status, retry_after) for the next requests
+        self._lock = threading.Lock()
+        self._server = StubHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_capture(self, website_url, timestamp, html):
+        self.captures.setdefault(unquote(website_url), {})[timestamp] = html
+
+    def set_faults(self, error_rate=0.0, error_status=503, latency=0.0, max_concurrent=None, retry_after=None,
+                   seed=None):
+        # error_rate: share of requests answered with error_status. max_concurrent: requests
+        # beyond this many in flight get 429. latency: seconds added to every response.
+        # retry_after: Retry-After header (seconds) sent with 429 and 503 answers.
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.latency = latency
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+    def inject(self, status, count=1, retry_after=None):
+        # The next `count` requests are answered with `status`
+        with self._lock:
+            self._injected.extend([(status, retry_after)] * count)
+
+    def begin_request(self):
+        # Returns (status, retry_after) when this request should fail, else None
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if self._injected:
+                fault = self._injected.popleft()
+            elif self.max_concurrent is not None and self.in_flight > self.max_concurrent:
+                fault = (429, self.retry_after)
+            elif self.error_rate and self.random.random() < self.error_rate:
+                fault = (self.error_status, self.retry_after if self.error_status in (429, 503) else None)
+            else:
+                return None
+            self.requests[f"fault_{fault[0]}"] += 1
+            return fault
+
+    def end_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def cdx_rows(self, query):
+        website_url = unquote(query.get('url', [''])[0])
+        start = query.get('from', [''])[0]
+        end = query.get('to', [''])[0]
+        collapse = query.get('collapse', [''])[0]
+        digits = int(collapse.split(':')[1]) if collapse.startswith('timestamp:') else None
+
+        rows = [['timestamp', 'statuscode']]
+        seen = set()
+        for timestamp in sorted(self.captures.get(website_url, {})):
+            if start and timestamp[:len(start)] < start:
+                continue
+            if end and timestamp[:len(end)] > end:
+                continue
+            if digits is not None:
+                if timestamp[:digits] in seen:
+                    continue
+                seen.add(timestamp[:digits])
+            rows.append([timestamp, '200'])
+        return rows
+
+    def nearest_capture(self, website_url, timestamp):
+        pages = self.captures.get(website_url)
+        if not pages:
+            return None
+        target = int(timestamp.ljust(14, '0'))
+        return min(pages, key=lambda capture: abs(int(capture) - target))
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive like the real archive, so the client's connection pool is reused
+            # rather than reconnecting for every request; every reply sends Content-Length
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                fault = stub.begin_request()
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    if fault:
+                        status, retry_after = fault
+                        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+                        return self.reply(status, b'Injected fault', headers=headers)
+                    self.serve()
+                finally:
+                    stub.end_request()
+
+            def serve(self):
+                parsed = urlparse(self.path)
+                if parsed.path == '/cdx/search/cdx':
+                    stub.requests['cdx'] += 1
+                    body = json.dumps(stub.cdx_rows(parse_qs(parsed.query))).encode('utf-8')
+                    return self.reply(200, body, 'application/json')
+
+                match = WEB_PATH.match(self.path)
+                if not match:
+                    return self.reply(404, b'Not Found')
+                timestamp, mode, website_url = match.group(1), match.group(2), unquote(match.group(3))
+                capture = stub.nearest_capture(website_url, timestamp)
+                if capture is None:
+                    stub.requests['missing'] += 1
+                    return self.reply(404, b'Not Found')
+                if capture != timestamp:
+                    # Wayback redirects to the closest capture it actually has
+                    stub.requests['redirect'] += 1
+                    self.send_response(302)
+                    self.send_header('Location', f"/web/{capture}{mode}/{match.group(3)}")
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                stub.requests['page'] += 1
+                self.reply(200, stub.captures[website_url][capture].encode('utf-8'))
+
+            def reply(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,117 @@
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from .metrics import METRICS, warn
+
+# Adaptive per-host throttling for archive requests. Each host gets a token bucket
+# (steady request rate with a small burst) and an AIMD concurrency limit: every
+# successful response raises the limit by 1/limit, a throttled or failed one halves it
+# (at most once per DECREASE_INTERVAL). Retry-After pauses the whole host, and after
+# failure_threshold consecutive failures the circuit opens: the host is paused for
+# `cooldown` seconds and then probed with one request at a time until one succeeds.
+
+THROTTLED = {429, 503}  # "Slow down" answers
+RETRYABLE = THROTTLED | {408, 500, 502, 504}
+DECREASE_INTERVAL = 1.0
+
+
+def parse_retry_after(value):
+    # Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    # Exponential backoff with full jitter, so retries from many threads spread out
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class HostThrottle:
+    def __init__(self, host, max_concurrency=4, rate=5.0, burst=None, failure_threshold=5, cooldown=30.0,
+                 max_pause=300.0):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)  # Current AIMD concurrency limit
+        self.rate = rate  # Tokens (requests) per second
+        self.burst = burst or max_concurrency
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_pause = max_pause  # Upper bound for a single Retry-After
+
+        self.tokens = float(self.burst)
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.failures = 0  # Consecutive failed or throttled responses
+        self.circuit_open = False
+        self.paused_until = 0.0
+        self.decreased = 0.0
+        self.stats = Counter()
+        self._condition = threading.Condition()
+
+    def _allowed(self):
+        # Half-open circuit: one probe at a time
+        return 1 if self.circuit_open else max(1, int(self.limit))
+
+    def acquire(self):
+        # Blocks until the host is not paused, a concurrency slot is free and a token is
+        # available. Returns the seconds spent waiting
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+                self.refilled = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= self._allowed():
+                    wait = None  # Until a request finishes
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.stats['requests'] += 1
+                    self.stats['wait_seconds'] += now - started
+                    return now - started
+                self._condition.wait(wait)
+
+    def release(self, status=None, retry_after=None):
+        # status: HTTP status of the response, None when the request failed without one.
+        # Anything below 500 other than 429 counts as a healthy answer, 404 included.
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status is not None and status < 500 and status not in THROTTLED:
+                self.failures = 0
+                self.circuit_open = False
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            else:
+                self.failures += 1
+                self.stats['throttled' if status in THROTTLED else 'errors'] += 1
+                if now - self.decreased >= DECREASE_INTERVAL:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.decreased = now
+                pause = parse_retry_after(retry_after)
+                if pause is not None:
+                    self.paused_until = max(self.paused_until, now + min(pause, self.max_pause))
+                if self.failures >= self.failure_threshold:
+                    if not self.circuit_open:
+                        self.stats['circuit_opens'] += 1
+                        METRICS.inc('circuit_opens', host=self.host)
+                        warn(f"{self.host} keeps failing, pausing it for {self.cooldown:.0f} s")
+                    self.circuit_open = True
+                    self.paused_until = max(self.paused_until, now + self.cooldown)
+            self._condition.notify_all()
@@ -0,0 +1,377 @@
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+import codecs
+import csv
+import hashlib
+import re
+import threading
+import time
+import warnings
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from requests.exceptions import HTTPError, ConnectionError, Timeout, RequestException
+from urllib3.util import make_headers
+from .throttle import HostThrottle, RETRYABLE, backoff_delay
+from .metrics import METRICS, BYTES_BUCKETS, info, warn
+
+WAYBACK_HOST = "http://web.archive.org"
+
+# Bucket keys used to keep at most one capture per day, ISO week or month
+CAPTURE_BUCKETS = {
+    'day': lambda date: (date.year, date.month, date.day),
+    'week': lambda date: tuple(date.isocalendar()[:2]),
+    'month': lambda date: (date.year, date.month),
+}
+
+# Timestamp of the capture Wayback actually served, taken from the final (redirected) URL
+CAPTURE_TIMESTAMP = re.compile(r"/web/(\d{14})")
+
+# Wayback serves the original, unmodified capture (no toolbar or rewritten links) with this suffix
+RAW_MODE = 'id_'
+
+# html plus the capture it resolved to, a digest of its content, the bytes read off the
+# wire (0 when served from cache) and the decoded page size
+Snapshot = namedtuple('Snapshot', ['html', 'capture_timestamp', 'digest', 'wire_bytes', 'size_bytes'])
+
+# Shared keep-alive pool and per-host concurrency, set once per run by configure_fetch
+# before anything is fetched
+FETCH_SETTINGS = {'pool_size': 16, 'max_per_host': 4}
+
+_session = None
+_session_lock = threading.Lock()
+
+# Optional SnapshotCache consulted before any request is made
+_cache = None
+
+# One adaptive throttle per outgoing host, shared by every fetch running in the process
+_throttles = {}
+_throttles_lock = threading.Lock()
+THROTTLE_SETTINGS = {'rate': 5.0, 'failure_threshold': 5, 'cooldown': 30.0}
+
+# Retries wait a random 0..BACKOFF_BASE * 2 ** attempt seconds, at most BACKOFF_CAP
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+
+def configure_fetch(max_workers, max_per_host):
+    # Sizes the session pool for max_workers downloads at once and the host throttles for
+    # max_per_host; the session and throttles made under earlier settings are replaced
+    global _session, _throttles
+    with _session_lock, _throttles_lock:
+        FETCH_SETTINGS.update(pool_size=max(max_workers, max_per_host), max_per_host=max_per_host)
+        if _session is not None:
+            _session.close()
+        _session = None
+        _throttles = {}
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # gzip/deflate, plus brotli when the optional brotli package is installed
+            session.headers.update(make_headers(accept_encoding=True))
+            pool_size = FETCH_SETTINGS['pool_size']
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
+
+
+def host_throttle(url):
+    host = urlparse(url).netloc
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = HostThrottle(host, max_concurrency=FETCH_SETTINGS['max_per_host'],
+                                            **THROTTLE_SETTINGS)
+        return _throttles[host]
+
+
+def throttle_stats():
+    # Per-host throttle counters and current concurrency limit, for run reports
+    with _throttles_lock:
+        return {host: dict(throttle.stats, limit=throttle.limit) for host, throttle in _throttles.items()}
+
+
+def throttled_get(session, url, stage, site, **kwargs):
+    # session.get once the host's throttle allows it; the outcome adjusts the throttle and
+    # is recorded under the stage ('fetch' or 'cdx') and site labels
+    throttle = host_throttle(url)
+    METRICS.observe('throttle_wait_seconds', throttle.acquire(), host=throttle.host)
+    started = time.perf_counter()
+    response = None
+    try:
+        response = session.get(url, **kwargs)
+        return response
+    finally:
+        status = response.status_code if response is not None else None
+        METRICS.observe('request_seconds', time.perf_counter() - started, stage=stage, site=site)
+        METRICS.inc('requests', stage=stage, site=site, status=status or 'error')
+        throttle.release(status, response.headers.get('Retry-After') if response is not None else None)
+
+
+def wait_before_retry(attempt, max_retries, stage, site):
+    if attempt + 1 < max_retries:
+        delay = backoff_delay(attempt, BACKOFF_BASE, BACKOFF_CAP)
+        METRICS.inc('retries', stage=stage, site=site)
+        info(f"Retrying in {delay:.1f} s... (Attempt {attempt + 1}/{max_retries})")
+        time.sleep(delay)
+
+
+def read_body(response, max_page_bytes, chunk_bytes=64 * 1024):
+    # Body of a stream=True response as UTF-8 bytes, or None once it grows past
+    # max_page_bytes. UTF-8 pages are kept as read, others are decoded like response.text
+    # and re-encoded; either way one copy of the page is left
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_bytes):
+            size += len(chunk)
+            if size > max_page_bytes:
+                return None
+            chunks.append(chunk)
+    finally:
+        response.close()
+    content = b"".join(chunks)
+    del chunks
+    encoding = response.encoding or chardet.detect(content)['encoding']
+    try:
+        if codecs.lookup(encoding).name == 'utf-8':
+            return content  # Invalid sequences are replaced when the page is parsed
+        return str(content, encoding, errors='replace').encode('utf-8')
+    except (LookupError, TypeError):
+        return content
+
+
+def make_snapshot(html, capture_timestamp, wire_bytes=0):
+    # html: str, or UTF-8 bytes when streamed, hashed as they are
+    content = html if isinstance(html, bytes) else html.encode('utf-8')
+    return Snapshot(html, capture_timestamp, hashlib.sha1(content).hexdigest(), wire_bytes, len(content))
+
+
+def get_archived_snapshot(website_url, timestamp, max_retries=3, session=None, cache=None, raw=False,
+                          max_page_bytes=None):
+    # max_page_bytes: stream the page and give up on it past this size. Streamed pages
+    # come back as UTF-8 bytes rather than str
+    mode = RAW_MODE if raw else ''
+    cache = cache or _cache
+    if cache is not None:
+        cached = cache.get(website_url, timestamp, mode, binary=max_page_bytes is not None)
+        METRICS.inc('cache', site=website_url, result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            capture_timestamp, html = cached
+            if max_page_bytes is not None and len(html) > max_page_bytes:
+                METRICS.inc('errors', stage='fetch', site=website_url, kind='too_large')
+                warn(f"Skipping {website_url} at {timestamp}: page is over {max_page_bytes} bytes")
+                return None
+            return make_snapshot(html, capture_timestamp or timestamp)
+        if cache.offline:
+            info(f"Offline mode: no cached snapshot for {website_url} at {timestamp}.")
+            return None
+
+    session = session or get_session()
+    wayback_url = f"{WAYBACK_HOST}/web/{timestamp}{mode}/{website_url}"
+    with METRICS.timer('stage_seconds', stage='fetch', site=website_url):
+        for attempt in range(max_retries):
+            response = None
+            try:
+                info(f"Retrieving data for {website_url} at {timestamp}...")
+                response = throttled_get(session, wayback_url, 'fetch', website_url, timeout=10,
+                                         stream=max_page_bytes is not None)
+                response.raise_for_status()
+                html = response.text if max_page_bytes is None else read_body(response, max_page_bytes)
+                if html is None:
+                    METRICS.inc('errors', stage='fetch', site=website_url, kind='too_large')
+                    warn(f"Skipping {website_url} at {timestamp}: page is over {max_page_bytes} bytes")
+                    return None
+                info("Data retrieved successfully.")
+                match = CAPTURE_TIMESTAMP.search(response.url)
+                capture_timestamp = match.group(1) if match else timestamp
+                # urllib3 counts the (possibly compressed) bytes pulled from the socket
+                wire_bytes = response.raw.tell() if response.raw is not None else len(response.content)
+                if cache is not None:
+                    cache.put(website_url, timestamp, html, capture_timestamp, mode)
+                snapshot = make_snapshot(html, capture_timestamp, wire_bytes)
+                METRICS.inc('bytes', wire_bytes, stage='fetch', site=website_url, kind='wire')
+                METRICS.inc('bytes', snapshot.size_bytes, stage='fetch', site=website_url, kind='decoded')
+                METRICS.observe('page_bytes', snapshot.size_bytes, buckets=BYTES_BUCKETS, site=website_url)
+                return snapshot
+
+            except HTTPError as errh:
+                METRICS.inc('errors', stage='fetch', site=website_url, kind=str(response.status_code))
+                if response is not None and response.status_code == 404:
+                    info(f"Error 404: {wayback_url} not found.")
+                else:
+                    info(f"HTTP Error: {errh}")
+                if response is not None and response.status_code not in RETRYABLE:
+                    return None  # Retrying will not change the answer
+
+            except ConnectionError as errc:
+                METRICS.inc('errors', stage='fetch', site=website_url, kind='connection')
+                warnings.warn(f"Error Connecting: {errc}", RuntimeWarning)
+
+            except Timeout as errt:
+                METRICS.inc('errors', stage='fetch', site=website_url, kind='timeout')
+                info(f"Timeout Error: {errt}")
+
+            except RequestException as err:
+                METRICS.inc('errors', stage='fetch', site=website_url, kind='request')
+                info(f"An error occurred: {err}")
+
+            wait_before_retry(attempt, max_retries, 'fetch', website_url)
+
+        METRICS.inc('failures', stage='fetch', site=website_url)
+        warn(f"Max retries ({max_retries}) exceeded. Unable to retrieve {website_url} at {timestamp}.")
+        return None
+
+
+def get_archived_html(website_url, timestamp, max_retries=3, session=None, cache=None, raw=False,
+                      max_page_bytes=None):
+    snapshot = get_archived_snapshot(website_url, timestamp, max_retries, session, cache, raw, max_page_bytes)
+    return snapshot.html if snapshot else None
+
+
+def fetch_snapshots(website_url, timestamps, max_workers=8, max_retries=3, cache=None, raw=False,
+                    max_page_bytes=None, budget=None):
+    # Yields (timestamp, Snapshot or None) in the order of `timestamps` while up to
+    # `max_workers` requests are in flight over the shared keep-alive pool. budget: a
+    # pipeline.ByteBudget (with max_page_bytes) that every download reserves
+    # max_page_bytes of before it starts; the consumer releases each page's size_bytes.
+    session = get_session()
+    pending = deque()
+    timestamps = deque(timestamps)
+
+    def fetch(timestamp):
+        snapshot = None
+        try:
+            snapshot = get_archived_snapshot(website_url, timestamp, max_retries, session, cache, raw,
+                                             max_page_bytes)
+            return snapshot
+        finally:
+            if budget is not None:
+                budget.release(max_page_bytes - (snapshot.size_bytes if snapshot else 0))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_next(blocking):
+            # Only waits for the budget when nothing is pending, so pages it holds are
+            # never stuck behind the download that waits
+            if not timestamps or (budget is not None and not budget.acquire(max_page_bytes, blocking)):
+                return False
+            timestamp = timestamps.popleft()
+            pending.append((timestamp, executor.submit(fetch, timestamp)))
+            return True
+
+        # Keep a bounded window of futures so long ranges do not queue everything up front
+        while True:
+            while len(pending) < max_workers * 2 and submit_next(blocking=not pending):
+                pass
+            if not pending:
+                break
+            timestamp, future = pending.popleft()
+            while len(pending) < max_workers * 2 and submit_next(blocking=False):
+                pass
+            yield timestamp, future.result()
+
+
+def list_captures(website_url, start_date, end_date, granularity='day', max_retries=3, session=None):
+    # Ask the CDX index once for every capture of `website_url` in range instead of
+    # probing each calendar day. Returns 14-digit capture timestamps in order, at most
+    # one per `granularity` bucket ('day', 'week' or 'month'), or None if CDX is unavailable.
+    session = session or get_session()
+    params = {
+        'url': website_url,
+        'from': start_date.strftime("%Y%m%d"),
+        'to': end_date.strftime("%Y%m%d"),
+        'output': 'json',
+        'fl': 'timestamp,statuscode',
+        'filter': 'statuscode:200',
+        'collapse': 'timestamp:8',  # At most one row per day from the server side
+    }
+    cdx_url = f"{WAYBACK_HOST}/cdx/search/cdx"
+
+    for attempt in range(max_retries):
+        try:
+            info(f"Listing captures for {website_url}...")
+            response = throttled_get(session, cdx_url, 'cdx', website_url, params=params, timeout=30)
+            response.raise_for_status()
+            rows = response.json() if response.text.strip() else []
+            break
+        except (RequestException, ValueError) as err:
+            METRICS.inc('errors', stage='cdx', site=website_url, kind=type(err).__name__)
+            warn(f"CDX listing failed: {err}")
+            wait_before_retry(attempt, max_retries, 'cdx', website_url)
+    else:
+        METRICS.inc('failures', stage='cdx', site=website_url)
+        return None
+
+    captures = one_per_bucket(sorted(row[0] for row in rows[1:]), granularity)  # First row is the field header
+    METRICS.inc('captures', len(captures), site=website_url)
+    return captures
+
+
+def one_per_bucket(timestamps, granularity):
+    # The first of the sorted `timestamps` in each `granularity` bucket
+    bucket = CAPTURE_BUCKETS[granularity]
+    seen = set()
+    captures = []
+    for timestamp in timestamps:
+        key = bucket(datetime.strptime(timestamp[:8], "%Y%m%d"))
+        if key not in seen:
+            seen.add(key)
+            captures.append(timestamp)
+    return captures
+
+
+def capture_timestamps(website_url, start_date, end_date, granularity='day', raw=False, cache=None):
+    # Captures to fetch for a date range: the CDX listing, or every calendar day when the
+    # index is unavailable. Offline, the captures in the snapshot cache are listed instead.
+    # Results are kept per day, so at most one capture per day is listed
+    if granularity not in CAPTURE_BUCKETS:
+        raise ValueError(f"Unknown capture granularity: {granularity} (known: {', '.join(CAPTURE_BUCKETS)})")
+    cache = cache or _cache
+    cached = []
+    if cache is not None:
+        first_day, last_day = start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d")
+        cached = [timestamp for timestamp in cache.timestamps(website_url, RAW_MODE if raw else '')
+                  if first_day <= timestamp[:8] <= last_day]
+        if cache.offline:
+            if not cached:
+                warn(f"Offline mode: no cached captures of {website_url} in range")
+            return one_per_bucket(cached, granularity)
+
+    captures = list_captures(website_url, start_date, end_date, granularity)
+    if captures is None:
+        # Days already cached keep the capture timestamp they were cached under, so the
+        # pages are read back from the cache rather than downloaded again
+        cached_days = {timestamp[:8]: timestamp for timestamp in one_per_bucket(cached, 'day')}
+        captures = [cached_days.get(day, day) for day in
+                    ((start_date + timedelta(days=offset)).strftime("%Y%m%d")
+                     for offset in range((end_date - start_date).days + 1))]
+    return captures
+
+
+def report_snapshot_costs(snapshot_costs, output_file="snapshot_costs.csv"):
+    # snapshot_costs: dicts with website, timestamp, capture, wire_bytes, size_bytes, parse_seconds
+    if not snapshot_costs:
+        return
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(snapshot_costs[0]))
+        writer.writeheader()
+        writer.writerows(snapshot_costs)
+
+    wire_bytes = sum(row['wire_bytes'] for row in snapshot_costs)
+    size_bytes = sum(row['size_bytes'] for row in snapshot_costs)
+    parse_seconds = sum(row['parse_seconds'] for row in snapshot_costs)
+    print(f"Transferred {wire_bytes / 1024 ** 2:.1f} MB for {size_bytes / 1024 ** 2:.1f} MB of pages, "
+          f"average parse {parse_seconds / len(snapshot_costs) * 1000:.1f} ms over {len(snapshot_costs)} snapshots")
+    print(f"Snapshot costs saved to {output_file}")